@@ -9,23 +9,24 @@
 
 # Standard library imports
 from collections import deque
-import bz2
-import json
 import logging
-import os
 import time
 
 # Third party imports
 from binstar_client.utils import get_config, set_config
-from qtpy.QtCore import QObject, QThread, QTimer, Signal
+from qtpy.QtCore import QObject, QThread, Signal
 import binstar_client
 
 # Local imports
 from conda_manager.api.conda_api import CondaAPI
+from conda_manager.models.packages import PackagesModelData
 from conda_manager.utils import constants as C
 from conda_manager.utils import sort_versions
+from conda_manager.utils.blacklist import PackageBlacklist
 from conda_manager.utils.logs import logger
-from conda_manager.utils.py3compat import to_text_string
+from conda_manager.utils.repodata import RepodataIndex
+from conda_manager.utils.store import PackageRecord, installed_status
+from conda_manager.utils.threads import WorkerThreads
 
 
 class ClientWorker(QObject):
@@ -72,40 +73,22 @@ class ClientWorker(QObject):
 class _ClientAPI(QObject):
     """Anaconda Client API wrapper."""
 
-    def __init__(self):
+    def __init__(self, repodata_processes=None):
         """Anaconda Client API wrapper."""
         super(QObject, self).__init__()
+        self._repodata_processes = repodata_processes
+        self._repodata_index = RepodataIndex()
         self._anaconda_client_api = binstar_client.utils.get_server_api(
             log_level=logging.NOTSET)
         self._queue = deque()
-        self._threads = []
-        self._workers = []
-        self._timer = QTimer()
+        self._threads = WorkerThreads(self)
         self._conda_api = CondaAPI()
 
-        self._timer.setInterval(1000)
-        self._timer.timeout.connect(self._clean)
-
-    def _clean(self):
-        """Check for inactive workers and remove their references."""
-        if self._workers:
-            for w in self._workers:
-                if w.is_finished():
-                    self._workers.remove(w)
-
-        if self._threads:
-            for t in self._threads:
-                if t.isFinished():
-                    self._threads.remove(t)
-        else:
-            self._timer.stop()
-
     def _start(self):
         """Take avalaible worker from the queue and start it."""
         if len(self._queue) == 1:
             thread = self._queue.popleft()
             thread.start()
-            self._timer.start()
 
     def _create_worker(self, method, *args, **kwargs):
         """Create a worker for this client to be run in a separate thread."""
@@ -117,101 +100,61 @@ class _ClientAPI(QObject):
         worker.sig_finished.connect(thread.quit)
         thread.started.connect(worker.start)
         self._queue.append(thread)
-        self._threads.append(thread)
-        self._workers.append(worker)
+        self._threads.add(thread, worker)
         self._start()
         return worker
 
-    @staticmethod
-    def _load_repodata(filepaths, extra_data=None, metadata=None):
+    def _load_repodata(self, filepaths, extra_data=None, metadata=None,
+                       processes=None, index_path=None):
         """Load all the available pacakges information.
 
         For downloaded repodata files (repo.continuum.io), additional
         data provided (anaconda cloud), and additional metadata and merge into
         a single set of packages and apps.
+
+        Each file is parsed and reduced in a pool of `processes` processes and
+        the partial results are merged here. Only files that changed since
+        the previous call are parsed again.
+
+        If `index_path` is given, the result is cached there and reused as
+        long as the files and the metadata do not change.
         """
         extra_data = extra_data if extra_data else {}
-        metadata = metadata if metadata else {}
-        repodata = []
-        for filepath in filepaths:
-            compressed = filepath.endswith('.bz2')
-            mode = 'rb' if filepath.endswith('.bz2') else 'r'
-
-            if os.path.isfile(filepath):
-                with open(filepath, mode) as f:
-                    raw_data = f.read()
-
-                if compressed:
-                    data = bz2.decompress(raw_data)
-                else:
-                    data = raw_data
-
-                try:
-                    data = json.loads(to_text_string(data, 'UTF-8'))
-                except Exception as error:
-                    logger.error(str(error))
-                    data = {}
-
-                repodata.append(data)
-
-        all_packages = {}
-        for data in repodata:
-            packages = data.get('packages', {})
-            for canonical_name in packages:
-                data = packages[canonical_name]
-                name, version, b = tuple(canonical_name.rsplit('-', 2))
-
-                if name not in all_packages:
-                    all_packages[name] = {'versions': set(),
-                                          'size': {},
-                                          'type': {},
-                                          'app_entry': {},
-                                          'app_type': {},
-                                          }
-                elif name in metadata:
-                    temp_data = all_packages[name]
-                    temp_data['home'] = metadata[name].get('home', '')
-                    temp_data['license'] = metadata[name].get('license', '')
-                    temp_data['summary'] = metadata[name].get('summary', '')
-                    temp_data['latest_version'] = metadata[name].get('version')
-                    all_packages[name] = temp_data
-
-                all_packages[name]['versions'].add(version)
-                all_packages[name]['size'][version] = data.get('size', '')
-
-                # Only the latest builds will have the correct metadata for
-                # apps, so only store apps that have the app metadata
-                if data.get('type'):
-                    all_packages[name]['type'][version] = data.get('type')
-                    all_packages[name]['app_entry'][version] = data.get(
-                        'app_entry')
-                    all_packages[name]['app_type'][version] = data.get(
-                        'app_type')
-
-        all_apps = {}
-        for name in all_packages:
-            versions = sort_versions(list(all_packages[name]['versions']))
-            all_packages[name]['versions'] = versions[:]
-
-            for version in versions:
-                has_type = all_packages[name].get('type')
-                # Has type in this case implies being an app
-                if has_type:
-                    all_apps[name] = all_packages[name].copy()
-                    # Remove all versions that are not apps!
-                    versions = all_apps[name]['versions'][:]
-                    types = all_apps[name]['type']
-                    app_versions = [v for v in versions if v in types]
-                    all_apps[name]['versions'] = app_versions
-
-        return all_packages, all_apps
+        return self._repodata_index.load(filepaths, metadata=metadata,
+                                         processes=processes,
+                                         index_path=index_path)
+
+    def _prepare_model(self, packages, linked, pip=None,
+                       private_packages=None, blacklist=None):
+        """
+        Prepare the `PackagesModelData` of the packages table model.
+
+        The rows are converted to columns and indexed here, so the GUI
+        thread only has to create the model.
+        """
+        packages, rows = self._prepare_model_data(
+            packages, linked, pip=pip, private_packages=private_packages,
+            blacklist=blacklist)
+        return PackagesModelData(packages, rows)
 
     @staticmethod
     def _prepare_model_data(packages, linked, pip=None,
-                            private_packages=None):
-        """Prepare model data for the packages table model."""
+                            private_packages=None, blacklist=None):
+        """
+        Prepare model data for the packages table model.
+
+        `packages` is a `PackageStore`, private packages are added to it. The
+        records held by `packages` are shared with the repodata index, so
+        records are replaced instead of modified.
+
+        Packages in `blacklist` (a `PackageBlacklist` or a list of names and
+        patterns) are removed from `packages` and the rows. Return the
+        `(packages, rows)` tuple, rows are sorted by name.
+        """
         pip = pip if pip else []
         private_packages = private_packages if private_packages else {}
+        if not isinstance(blacklist, PackageBlacklist):
+            blacklist = PackageBlacklist(blacklist or ())
 
         data = []
 
@@ -219,16 +162,16 @@ class _ClientAPI(QObject):
             for pkg in private_packages:
                 if pkg in packages:
                     p_data = packages.get(pkg)
-                    versions = p_data.get('versions', '') if p_data else []
+                    versions = list(p_data.versions)
                     private_versions = private_packages[pkg]['versions']
                     all_versions = sort_versions(list(set(versions +
                                                           private_versions)))
-                    packages[pkg]['versions'] = all_versions
+                    packages[pkg] = p_data.copy(versions=all_versions)
                 else:
                     private_versions = sort_versions(
                         private_packages[pkg]['versions'])
-                    private_packages[pkg]['versions'] = private_versions
-                    packages[pkg] = private_packages[pkg]
+                    packages[pkg] = PackageRecord.from_data(
+                        dict(private_packages[pkg], versions=private_versions))
         else:
             private_packages = {}
 
@@ -250,13 +193,20 @@ class _ClientAPI(QObject):
                                      )
                                 )
 
+        blacklisted = blacklist.filter_names(packages_names)
+        for name in blacklisted:
+            packages.pop(name, None)
+
         for name in packages_names:
+            if name in blacklisted:
+                continue
+
             p_data = packages.get(name)
 
             summary = p_data.get('summary', '') if p_data else ''
             url = p_data.get('home', '') if p_data else ''
             license_ = p_data.get('license', '') if p_data else ''
-            versions = p_data.get('versions', '') if p_data else []
+            versions = list(p_data.versions) if p_data else []
             version = p_data.get('latest_version', '') if p_data else ''
 
             if name in pip_packages:
@@ -266,19 +216,7 @@ class _ClientAPI(QObject):
             elif name in linked_packages:
                 type_ = C.CONDA_PACKAGE
                 version = linked_packages[name].get('version', '')
-                status = C.INSTALLED
-
-                if version in versions:
-                    vers = versions
-                    upgradable = not version == vers[-1] and len(vers) != 1
-                    downgradable = not version == vers[0] and len(vers) != 1
-
-                    if upgradable and downgradable:
-                        status = C.MIXGRADABLE
-                    elif upgradable:
-                        status = C.UPGRADABLE
-                    elif downgradable:
-                        status = C.DOWNGRADABLE
+                status = installed_status(version, versions)
             else:
                 type_ = C.CONDA_PACKAGE
                 status = C.NOT_INSTALLED
@@ -302,7 +240,7 @@ class _ClientAPI(QObject):
                    }
 
             data.append(row)
-        return data
+        return packages, data
 
     # --- Public API
     # -------------------------------------------------------------------------
@@ -319,25 +257,43 @@ class _ClientAPI(QObject):
         method = self._anaconda_client_api.remove_authentication
         return self._create_worker(method)
 
-    def load_repodata(self, filepaths, extra_data=None, metadata=None):
+    def load_repodata(self, filepaths, extra_data=None, metadata=None,
+                      index_path=None):
         """
         Load all the available pacakges information for downloaded repodata.
 
         Files include repo.continuum.io, additional data provided (anaconda
         cloud), and additional metadata and merge into a single set of packages
-        and apps.
+        and apps. The result is cached in `index_path` if given.
         """
         logger.debug(str((filepaths)))
         method = self._load_repodata
         return self._create_worker(method, filepaths, extra_data=extra_data,
-                                   metadata=metadata)
+                                   metadata=metadata,
+                                   processes=self._repodata_processes,
+                                   index_path=index_path)
+
+    def set_repodata_processes(self, processes=None):
+        """
+        Set the number of processes used to parse repodata files.
+
+        If None, the number of cpus is used.
+        """
+        self._repodata_processes = processes
 
     def prepare_model_data(self, packages, linked, pip=None,
-                           private_packages=None):
-        """Prepare downloaded package info along with pip pacakges info."""
+                           private_packages=None, blacklist=None):
+        """
+        Prepare downloaded package info along with pip pacakges info.
+
+        Returns a worker, its output is the `PackagesModelData` of the
+        packages table model. `packages` must not be used until it finishes.
+        """
         logger.debug('')
-        return self._prepare_model_data(packages, linked, pip=pip,
-                                        private_packages=private_packages)
+        method = self._prepare_model
+        return self._create_worker(method, packages, linked, pip=pip,
+                                   private_packages=private_packages,
+                                   blacklist=blacklist)
 
     def set_domain(self, domain='https://api.anaconda.org'):
         """Reset current api domain."""
@@ -424,8 +380,8 @@ class _ClientAPI(QObject):
                 latest_version = item.get('latest_version', '')
                 if name and not public and 'conda' in package_types:
                     if name in private_packages:
-                        versions = private_packages.get('versions', []),
-                        new_versions = item.get('versions', []),
+                        versions = private_packages[name].get('versions', [])
+                        new_versions = item.get('versions', [])
                         vers = sort_versions(list(set(versions +
                                                       new_versions)))
                         private_packages[name]['versions'] = vers
@@ -485,12 +441,12 @@ class _ClientAPI(QObject):
 CLIENT_API = None
 
 
-def ClientAPI():
+def ClientAPI(repodata_processes=None):
     """Client API threaded worker."""
     global CLIENT_API
 
     if CLIENT_API is None:
-        CLIENT_API = _ClientAPI()
+        CLIENT_API = _ClientAPI(repodata_processes=repodata_processes)
 
     return CLIENT_API
 
@@ -13,21 +13,26 @@ This also add some extra methods to the original conda-api.
 
 # Standard library imports
 from collections import deque
-from os.path import abspath, basename, expanduser, isdir, join
+from functools import partial
+from os.path import abspath, expanduser, join
 import json
 import os
 import platform
-import re
 import sys
 
 # Third party imports
-from qtpy.QtCore import QByteArray, QObject, QProcess, QTimer, Signal
+from qtpy.QtCore import (QByteArray, QObject, QProcess, QThread, QTimer,
+                         Signal)
 import yaml
 
 # Local imports
-from conda_manager.utils.findpip import PIP_LIST_SCRIPT
+from conda_manager.utils import get_conf_path
+from conda_manager.utils.environments import (EnvironmentRegistry,
+                                              EnvironmentSnapshots)
 from conda_manager.utils.logs import logger
 from conda_manager.utils.py3compat import is_text_string
+from conda_manager.utils.sitepackages import SitePackages
+from conda_manager.utils.threads import WorkerThreads
 
 __version__ = '1.3.0'
 
@@ -64,6 +69,22 @@ PY2 = sys.version[0] == '2'
 PY3 = sys.version[0] == '3'
 DEBUG = False
 
+# Scheduling lanes of the process workers
+LANE_MUTATING = 'mutating'
+LANE_READ_ONLY = 'read_only'
+
+# File of the persistent `conda info` cache, in the configuration folder
+INFO_CACHE_FILENAME = 'conda-info.json'
+
+# Conda commands that modify environments or the configuration
+MUTATING_COMMANDS = ('clean', 'create', 'install', 'remove', 'uninstall',
+                     'update', 'upgrade')
+
+# Subcommands or options that make the `env` and `config` commands mutating
+MUTATING_ENV_COMMANDS = ('create', 'remove', 'update')
+MUTATING_CONFIG_OPTIONS = ('--add', '--append', '--prepend', '--remove',
+                           '--remove-key', '--set')
+
 
 def to_text_string(obj, encoding=None):
     """Convert `obj` to (unicode) text string."""
@@ -99,7 +120,7 @@ class ProcessWorker(QObject):
     sig_partial = Signal(object, object, object)
 
     def __init__(self, cmd_list, parse=False, pip=False, callback=None,
-                 extra_kwargs=None):
+                 extra_kwargs=None, lane=LANE_READ_ONLY, lock_keys=()):
         """Conda worker based on a QProcess for non blocking UI.
 
         Parameters
@@ -114,8 +135,14 @@ class ProcessWorker(QObject):
             If the process has a callback to process output from comd_list.
         extra_kwargs : dict
             Arguments for the callback.
+        lane : str
+            Scheduling lane, `LANE_MUTATING` or `LANE_READ_ONLY`.
+        lock_keys : iterable of str
+            Normalized prefixes of the environments used by the command.
         """
         super(ProcessWorker, self).__init__()
+        self.lane = lane
+        self.lock_keys = frozenset(lock_keys)
         self._result = None
         self._cmd_list = cmd_list
         self._parse = parse
@@ -127,15 +154,18 @@ class ProcessWorker(QObject):
         self._partial_stdout = None
         self._extra_kwargs = extra_kwargs if extra_kwargs else {}
 
-        self._timer = QTimer()
         self._process = QProcess()
 
-        self._timer.setInterval(150)
-
-        self._timer.timeout.connect(self._communicate)
-        # self._process.finished.connect(self._communicate)
+        # Completion is driven by the process signals, no polling needed
+        self._process.finished.connect(self._communicate)
         self._process.readyReadStandardOutput.connect(self._partial)
 
+        # PyQt4 and PyQt5 < 5.6 only have the overloaded `error` signal
+        error_signal = getattr(self._process, 'errorOccurred', None)
+        if error_signal is None:
+            error_signal = self._process.error
+        error_signal.connect(self._process_error)
+
     def _partial(self):
         """Callback for partial output."""
         raw_stdout = self._process.readAllStandardOutput()
@@ -154,18 +184,44 @@ class ProcessWorker(QObject):
 
         self.sig_partial.emit(self, json_stdout, None)
 
-    def _communicate(self):
-        """Callback for communicate."""
-        if (not self._communicate_first and
-                self._process.state() == QProcess.NotRunning):
+    def _communicate(self, *args):
+        """Callback for the finished signal of the process."""
+        # `sig_finished` is emitted once the process signal returned, its
+        # slots may release the last reference of the worker and process
+        if not self._communicate_first:
+            QTimer.singleShot(0, self._finish)
+
+    def _finish(self):
+        """Retrieve the output of the finished process."""
+        if not self._communicate_first:
             self.communicate()
-        elif self._fired:
-            self._timer.stop()
+
+    def _process_error(self, error):
+        """Callback for process errors, finish if it could not start."""
+        # A process that failed to start never emits `finished`
+        if error == QProcess.FailedToStart and not self._communicate_first:
+            self._communicate_first = True
+            error = 'Failed to start: {0}'.format(' '.join(self._cmd_list))
+            logger.error(error)
+            self._result = None, error
+            self._fired = True
+            # Not emitted from the process signal, see `_communicate`
+            QTimer.singleShot(0, self._failed_to_start)
+
+    def _failed_to_start(self):
+        """Report the process that could not start."""
+        self.sig_finished.emit(self, *self._result)
 
     def communicate(self):
-        """Retrieve information."""
+        """
+        Retrieve information.
+
+        This is called once the process finishes, calling it before blocks
+        until the process finishes.
+        """
         self._communicate_first = True
-        self._process.waitForFinished()
+        if self._process.state() != QProcess.NotRunning:
+            self._process.waitForFinished()
 
         if self._partial_stdout is None:
             raw_stdout = self._process.readAllStandardOutput()
@@ -230,12 +286,78 @@ class ProcessWorker(QObject):
         if not self._fired:
             self._partial_ouput = None
             self._process.start(self._cmd_list[0], self._cmd_list[1:])
-            self._timer.start()
         else:
             raise CondaProcessWorker('A Conda ProcessWorker can only run once '
                                      'per method call.')
 
 
+class FunctionWorker(QObject):
+    """
+    Worker running a function in its own thread, without a process.
+
+    It has the interface of `ProcessWorker` so it can be queued in the same
+    lanes. The thread is started from the event loop, after the caller had
+    the chance to connect to `sig_finished`.
+    """
+
+    sig_finished = Signal(object, object, object)
+    sig_partial = Signal(object, object, object)
+
+    def __init__(self, method, threads, kwargs=None, lane=LANE_READ_ONLY,
+                 lock_keys=()):
+        """
+        Worker running a function in its own thread.
+
+        Parameters
+        ----------
+        method : func
+            Function to run, called with `kwargs`.
+        threads : WorkerThreads
+            Keeps the worker and its thread alive until the thread finishes.
+        """
+        super(FunctionWorker, self).__init__()
+        self.lane = lane
+        self.lock_keys = frozenset(lock_keys)
+        self._method = method
+        self._kwargs = kwargs if kwargs else {}
+        self._result = None
+        self._fired = False
+
+        self._thread = QThread()
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self.communicate)
+        self.sig_finished.connect(self._thread.quit)
+        threads.add(self._thread, self)
+
+    def communicate(self):
+        """Run the function if needed and return the `(output, error)`."""
+        if not self._fired:
+            self._fired = True
+            output, error = None, ''
+            try:
+                output = self._method(**self._kwargs)
+            except Exception as err:
+                logger.error(str((self._method.__name__, err)))
+                error = str(err)
+
+            self._result = output, error
+            self.sig_finished.emit(self, output, error)
+
+        return self._result
+
+    def close(self):
+        """Nothing to close, for compatibility with `ProcessWorker`."""
+        pass
+
+    def is_finished(self):
+        """Return True if worker has finished processing."""
+        return self._fired
+
+    def start(self):
+        """Start the thread on the next iteration of the event loop."""
+        QTimer.singleShot(0, self._thread.start)
+
+
 # --- API
 # -----------------------------------------------------------------------------
 class _CondaAPI(QObject):
@@ -246,41 +368,170 @@ class _CondaAPI(QObject):
     DEFAULT_CHANNELS = ['https://repo.continuum.io/pkgs/pro',
                         'https://repo.continuum.io/pkgs/free']
 
-    def __init__(self, parent=None):
+    # Maximum number of read only commands running at the same time
+    MAX_READ_ONLY_WORKERS = 3
+
+    sig_info_updated = Signal(object)
+
+    def __init__(self, parent=None,
+                 max_read_only_workers=MAX_READ_ONLY_WORKERS,
+                 info_cache_path=None):
         """Conda API to connect to conda in a non blocking way via QProcess."""
         super(_CondaAPI, self).__init__()
         self._parent = parent
+        self._max_read_only_workers = max_read_only_workers
         self._queue = deque()
-        self._timer = QTimer()
+        # Running mutating worker, mutating commands run one at a time
         self._current_worker = None
         self._workers = []
+        self._threads = WorkerThreads(self)
+        self._snapshots = EnvironmentSnapshots()
+        self._site_packages = SitePackages()
+        self._environments = EnvironmentRegistry()
+
+        # Cached `conda info --json` output and the key it is valid for
+        self._info = {}
+        self._info_key = None
+        self._info_worker = None
+        self._info_cache_path = info_cache_path
+        if info_cache_path is None:
+            self._info_cache_path = get_conf_path(INFO_CACHE_FILENAME)
+        self._load_info_cache()
 
-        self._timer.setInterval(1000)
-        self._timer.timeout.connect(self._clean)
+        # Set config files path
+        self.user_rc_path = abspath(expanduser('~/.condarc'))
+        self.sys_rc_path = None
 
         self.ROOT_PREFIX = None
         self.set_root_prefix()
 
-        # Set config files path
-        self.user_rc_path = abspath(expanduser('~/.condarc'))
-        self.sys_rc_path = join(self.ROOT_PREFIX, '.condarc')
-
-    def _clean(self):
-        """Remove references of inactive workers periodically."""
-        if self._workers:
-            for w in self._workers:
-                if w.is_finished():
-                    self._workers.remove(w)
-        else:
+    def _worker_finished(self, worker, output=None, error=None):
+        """Callback for a finished worker, release it once it returned."""
+        # The worker is still emitting `sig_finished`, dropping its last
+        # reference here would destroy it during its own signal
+        QTimer.singleShot(0, partial(self._release_worker, worker))
+
+    def _release_worker(self, worker):
+        """Remove the references of a finished worker and start the next."""
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if worker is self._current_worker:
             self._current_worker = None
-            self._timer.stop()
+        self._start()
+
+    def _can_start(self, worker, blocked_keys):
+        """Return True if `worker` can run along the running workers."""
+        if worker.lock_keys & blocked_keys:
+            return False
+
+        if worker.lane == LANE_MUTATING:
+            # Mutating commands are serialized and lock their environments
+            if self._current_worker is not None:
+                return False
+            return not any(w.lock_keys & worker.lock_keys
+                           for w in self._workers)
+        else:
+            read_only = [w for w in self._workers
+                         if w.lane == LANE_READ_ONLY]
+            if len(read_only) >= self._max_read_only_workers:
+                return False
+            # Environments being modified can not be read
+            current = self._current_worker
+            return current is None or not current.lock_keys & worker.lock_keys
 
     def _start(self):
-        if len(self._queue) == 1:
-            self._current_worker = self._queue.popleft()
-            self._workers.append(self._current_worker)
-            self._current_worker.start()
-            self._timer.start()
+        """
+        Start the queued workers that can run.
+
+        A single mutating command runs at a time, and up to
+        `max_read_only_workers` read only commands run in parallel. Workers
+        on the same environment never run concurrently if one of them is
+        mutating, and start in the order they were queued.
+        """
+        blocked_keys = set()
+        mutating_blocked = False
+
+        for worker in list(self._queue):
+            if worker.lane == LANE_MUTATING and mutating_blocked:
+                can_start = False
+            else:
+                can_start = self._can_start(worker, blocked_keys)
+
+            if can_start:
+                self._queue.remove(worker)
+                self._workers.append(worker)
+                if worker.lane == LANE_MUTATING:
+                    self._current_worker = worker
+                worker.start()
+            else:
+                # Keep the order of the later workers in the same lanes
+                blocked_keys.update(worker.lock_keys)
+                if worker.lane == LANE_MUTATING:
+                    mutating_blocked = True
+
+    def _queue_worker(self, worker):
+        """Queue `worker` and start it if possible."""
+        worker.sig_finished.connect(self._worker_finished)
+        self._queue.append(worker)
+        self._start()
+        return worker
+
+    def _lock_key(self, name=None, prefix=None):
+        """
+        Return the normalized prefix of environment `name` or `prefix`.
+
+        Names of environments not created yet resolve to the first envs
+        directory, where conda creates them.
+        """
+        if name:
+            prefix = self.get_prefix_envname(name)
+            if prefix is None:
+                prefix = join(self.get_envs_dirs()[0], name)
+        return os.path.normcase(abspath(expanduser(prefix)))
+
+    def _lock_keys(self, name=None, prefix=None):
+        """Return the lock keys of environment `name` or `prefix`."""
+        if not (name or prefix):
+            return frozenset()
+        return frozenset([self._lock_key(name=name, prefix=prefix)])
+
+    def _command_lane(self, args):
+        """
+        Return the `(lane, lock_keys)` of the conda command `args`.
+
+        The lock keys are the normalized prefixes of the environment the
+        command works on and of the environment it clones, if any.
+        """
+        lock_keys = set()
+        for option in ('--prefix', '-p', '--name', '-n', '--clone'):
+            if option not in args[:-1]:
+                continue
+
+            value = args[args.index(option) + 1]
+            if option in ('--prefix', '-p'):
+                lock_keys.add(self._lock_key(prefix=value))
+            elif option in ('--name', '-n'):
+                lock_keys.add(self._lock_key(name=value))
+            elif os.sep in value or '/' in value:
+                # Clone sources are either a prefix or a name
+                lock_keys.add(self._lock_key(prefix=value))
+            else:
+                lock_keys.add(self._lock_key(name=value))
+
+        command = args[0] if args else None
+        if command == 'env':
+            mutating = len(args) > 1 and args[1] in MUTATING_ENV_COMMANDS
+        elif command == 'config':
+            mutating = any(arg in MUTATING_CONFIG_OPTIONS for arg in args)
+        else:
+            mutating = command in MUTATING_COMMANDS
+
+        if mutating and '--dry-run' not in args:
+            lane = LANE_MUTATING
+        else:
+            lane = LANE_READ_ONLY
+
+        return lane, frozenset(lock_keys)
 
     def is_active(self):
         """Check if a worker is still active."""
@@ -316,13 +567,11 @@ class _CondaAPI(QObject):
 
         cmd_list.extend(extra_args)
 
+        lane, lock_keys = self._command_lane(extra_args)
         process_worker = ProcessWorker(cmd_list, parse=parse,
-                                       callback=callback)
-        process_worker.sig_finished.connect(self._start)
-        self._queue.append(process_worker)
-        self._start()
-
-        return process_worker
+                                       callback=callback, lane=lane,
+                                       lock_keys=lock_keys)
+        return self._queue_worker(process_worker)
 
     def _call_and_parse(self, extra_args, abspath=True, callback=None):
         return self._call_conda(extra_args, abspath=abspath, parse=True,
@@ -362,75 +611,186 @@ class _CondaAPI(QObject):
         """
         if prefix:
             self.ROOT_PREFIX = prefix
+            self.sys_rc_path = join(self.ROOT_PREFIX, '.condarc')
         else:
+            # Start from the `conda info` output of a previous session, it
+            # is refreshed in the background if its inputs changed
+            root_prefix = self._info.get('root_prefix')
+            if root_prefix and os.path.isdir(root_prefix):
+                self.ROOT_PREFIX = root_prefix
+                self.sys_rc_path = join(self.ROOT_PREFIX, '.condarc')
+                self.refresh_info()
+                return
+
+            self._clear_info_cache()
+
             # Find some conda instance, and then use info to get 'root_prefix'
             worker = self._call_and_parse(['info', '--json'], abspath=False)
             info = worker.communicate()[0]
             self.ROOT_PREFIX = info['root_prefix']
+            self.sys_rc_path = join(self.ROOT_PREFIX, '.condarc')
+            self._set_info(info)
 
-    def get_conda_version(self):
-        """Return the version of conda being used (invoked) as a string."""
-        return self._call_conda(['--version'],
-                                callback=self._get_conda_version)
+    # --- Conda info cache
+    # -------------------------------------------------------------------------
+    def _info_cache_key(self):
+        """
+        Return the inputs the output of `conda info` depends on.
 
-    @staticmethod
-    def _get_conda_version(stdout, stderr):
-        """Callback for get_conda_version."""
-        # argparse outputs version to stderr in Python < 3.4.
-        # http://bugs.python.org/issue18920
-        pat = re.compile(r'conda:?\s+(\d+\.\d\S+|unknown)')
-        m = pat.match(stderr.decode().strip())
-        if m is None:
-            m = pat.match(stdout.decode().strip())
+        These are the root prefix and the modification times of the condarc
+        files and of the root conda-meta folder (changed by conda updates).
+        """
+        key = [self.ROOT_PREFIX]
+        paths = [self.user_rc_path, self.sys_rc_path]
+        if self.ROOT_PREFIX:
+            paths.append(join(self.ROOT_PREFIX, 'conda-meta'))
+
+        for path in paths:
+            try:
+                key.append(os.path.getmtime(path))
+            except (OSError, TypeError):
+                key.append(None)
+
+        return key
+
+    def _load_info_cache(self):
+        """Load the `conda info` output saved by a previous session."""
+        try:
+            with open(self._info_cache_path) as f:
+                data = json.load(f)
+            self._info = data['info']
+            self._info_key = data['key']
+        except Exception:
+            self._info = {}
+            self._info_key = None
+
+    def _clear_info_cache(self):
+        """Forget the cached `conda info` output and remove its file."""
+        self._info = {}
+        self._info_key = None
+        try:
+            os.remove(self._info_cache_path)
+        except OSError:
+            pass
+
+    def _set_info(self, info, key=None):
+        """Set the cached `conda info` output and save it."""
+        if not isinstance(info, dict) or 'error' in info:
+            return
+
+        self._info = info
+        self._info_key = key if key is not None else self._info_cache_key()
+        try:
+            with open(self._info_cache_path, 'w') as f:
+                json.dump({'key': self._info_key, 'info': self._info}, f)
+        except Exception as error:
+            logger.error(str(('conda info cache', error)))
+
+    def _info_ready(self, worker, output, error):
+        """Callback for the background `conda info` refresh."""
+        # Released once `sig_finished` returned, not during the signal
+        QTimer.singleShot(0, partial(self._release_info_worker, worker))
+        if output:
+            self._set_info(output, key=worker.info_key)
+            self.sig_info_updated.emit(self._info)
+
+    def _release_info_worker(self, worker):
+        """Forget the finished `conda info` refresh `worker`."""
+        if worker is self._info_worker:
+            self._info_worker = None
+
+    def refresh_info(self, force=False):
+        """
+        Run `conda info` in the background if its inputs changed.
+
+        `sig_info_updated` is emitted with the new information.
+        """
+        key = self._info_cache_key()
+        if not force and key == self._info_key:
+            return None
+        worker = self._info_worker
+        if worker is not None and not worker.is_finished():
+            return worker
+
+        worker = self.info()
+        worker.info_key = key
+        worker.sig_finished.connect(self._info_ready)
+        self._info_worker = worker
+        return worker
+
+    def get_info(self):
+        """
+        Return the cached `conda info --json` output.
+
+        No process is run, a background refresh is started if the
+        configuration changed since the output was cached.
+        """
+        self.refresh_info()
+        return self._info
+
+    def get_envs_dirs(self):
+        """Return the directories where named environments are created."""
+        envs_dirs = self.get_info().get('envs_dirs')
+        if not envs_dirs:
+            envs_dirs = [join(self.ROOT_PREFIX, 'envs')]
+        return envs_dirs
+
+    def get_info_conda_version(self):
+        """Return the cached conda version or None if not known yet."""
+        return self.get_info().get('conda_version')
 
-        if m is None:
-            raise Exception('output did not match: {0}'.format(stderr))
+    def get_info_channels(self):
+        """Return the cached channel urls conda uses."""
+        return self.get_info().get('channels', [])
 
-        return m.group(1)
+    def get_info_platform(self):
+        """Return the cached conda platform or the one of this system."""
+        return self.get_info().get('platform') or self.get_platform()
+
+    def get_conda_version(self):
+        """
+        Return the version of conda being used (invoked) as a string.
+
+        The version is read from the cached `conda info` output, no process
+        is run. None is returned if it is not known yet.
+        """
+        return self.get_info_conda_version()
+
+    def _registry_envs_dirs(self):
+        """Return the envs directories scanned for environments."""
+        root_envs = join(self.ROOT_PREFIX, 'envs')
+        envs_dirs = [d for d in self.get_envs_dirs() if d != root_envs]
+        return [root_envs] + envs_dirs
 
     def get_envs(self, log=True):
-        """Return environment list of absolute path to their prefixes."""
+        """
+        Return environment list of absolute path to their prefixes.
+
+        Every envs directory and `~/.conda/environments.txt` are scanned,
+        only when they changed since the previous call.
+        """
         if log:
             logger.debug('')
-#        return self._call_and_parse(['info', '--json'],
-#                                    callback=lambda o, e: o['envs'])
-        envs = os.listdir(os.sep.join([self.ROOT_PREFIX, 'envs']))
-        envs = [os.sep.join([self.ROOT_PREFIX, 'envs', i]) for i in envs]
-
-        valid_envs = [e for e in envs if os.path.isdir(e) and
-                      self.environment_exists(prefix=e)]
-
-        return valid_envs
+        return self._environments.prefixes(self.ROOT_PREFIX,
+                                           self._registry_envs_dirs())
 
     def get_prefix_envname(self, name, log=False):
         """Return full prefix path of environment defined by `name`."""
-        prefix = None
-        if name == 'root':
-            prefix = self.ROOT_PREFIX
-
-#        envs, error = self.get_envs().communicate()
-        envs = self.get_envs()
-        for p in envs:
-            if basename(p) == name:
-                prefix = p
+        return self._environments.prefix(name, self.ROOT_PREFIX,
+                                         self._registry_envs_dirs())
 
-        return prefix
+    def linked(self, prefix):
+        """
+        Return frozenset of canonical names of linked packages in `prefix`.
 
-    @staticmethod
-    def linked(prefix):
-        """Return set of canonical names of linked packages in `prefix`."""
+        `conda-meta` is only read again if it changed since the last call.
+        """
         logger.debug(str(prefix))
+        return self._snapshots.linked(prefix)
 
-        if not isdir(prefix):
-            return set()
-
-        meta_dir = join(prefix, 'conda-meta')
-        if not isdir(meta_dir):
-            # We might have nothing in linked (and no conda-meta directory)
-            return set()
-
-        return set(fn[:-5] for fn in os.listdir(meta_dir)
-                   if fn.endswith('.json'))
+    def environment_snapshot(self, prefix):
+        """Return the `EnvironmentSnapshot` of the packages in `prefix`."""
+        return self._snapshots.get(prefix)
 
     @staticmethod
     def split_canonical_name(cname):
@@ -508,8 +868,7 @@ class _CondaAPI(QObject):
         cmd_list = ['create', '--yes', '--json', '--mkdir']
         if name:
             ref = name
-            search = [os.path.join(d, name) for d in
-                      self.info().communicate()[0]['envs_dirs']]
+            search = [os.path.join(d, name) for d in self.get_envs_dirs()]
             cmd_list.extend(['--name', name])
         elif prefix:
             ref = prefix
@@ -828,7 +1187,7 @@ class _CondaAPI(QObject):
 #        return self._call_and_parse(cmd_list, abspath=abspath)
 
     # --- Additional methods
-    # -----------------------------------------------------------------------------
+    # -------------------------------------------------------------------------
     def dependencies(self, name=None, prefix=None, pkgs=None, channels=None,
                      dep=True):
         """Get dependenciy list for packages to be installed in an env."""
@@ -888,25 +1247,17 @@ class _CondaAPI(QObject):
 
     def package_version(self, prefix=None, name=None, pkg=None, build=False):
         """Get installed package version in a given env."""
-        package_versions = {}
-
         if name and prefix:
             raise TypeError("Exactly one of 'name' or 'prefix' is required.")
 
         if name:
             prefix = self.get_prefix_envname(name)
+            if prefix is None:
+                return None
+        elif prefix is None:
+            prefix = self.ROOT_PREFIX
 
-        if self.environment_exists(prefix=prefix):
-
-            for package in self.linked(prefix):
-                if pkg in package:
-                    n, v, b = self.split_canonical_name(package)
-                    if build:
-                        package_versions[n] = '{0}={1}'.format(v, b)
-                    else:
-                        package_versions[n] = v
-
-        return package_versions.get(pkg)
+        return self._snapshots.package_version(prefix, pkg, build=build)
 
     @staticmethod
     def get_platform():
@@ -992,12 +1343,11 @@ class _CondaAPI(QObject):
         cmd_list = self._pip_cmd(name=name, prefix=prefix)
         cmd_list.extend(extra_args)
 
-        process_worker = ProcessWorker(cmd_list, pip=True, callback=callback)
-        process_worker.sig_finished.connect(self._start)
-        self._queue.append(process_worker)
-        self._start()
-
-        return process_worker
+        lane = self._command_lane(extra_args)[0]
+        process_worker = ProcessWorker(cmd_list, pip=True, callback=callback,
+                                       lane=lane,
+                                       lock_keys=self._lock_keys(name, prefix))
+        return self._queue_worker(process_worker)
 
     def _pip_cmd(self, name=None, prefix=None):
         """Get pip location based on environment `name` or `prefix`."""
@@ -1020,7 +1370,13 @@ class _CondaAPI(QObject):
         return cmd_list
 
     def pip_list(self, name=None, prefix=None, abspath=True):
-        """Get list of pip installed packages."""
+        """
+        Get list of pip installed packages.
+
+        The metadata of the environment site-packages is read in a thread
+        of this process (see `pip_packages`). The worker is queued like the
+        conda commands, so it runs after the ones on the same environment.
+        """
         if (name and prefix) or not (name or prefix):
             raise TypeError("conda pip: exactly one of 'name' ""or 'prefix' "
                             "required.")
@@ -1028,40 +1384,25 @@ class _CondaAPI(QObject):
         if name:
             prefix = self.get_prefix_envname(name)
 
-        pip_command = os.sep.join([prefix, 'bin', 'python'])
-        cmd_list = [pip_command, PIP_LIST_SCRIPT]
-        process_worker = ProcessWorker(cmd_list, pip=True, parse=True,
-                                       callback=self._pip_list,
-                                       extra_kwargs={'prefix': prefix})
-        process_worker.sig_finished.connect(self._start)
-        self._queue.append(process_worker)
-        self._start()
-
-        return process_worker
+        worker = FunctionWorker(self.pip_packages, self._threads,
+                                {'prefix': prefix}, lane=LANE_READ_ONLY,
+                                lock_keys=self._lock_keys(prefix=prefix))
+        return self._queue_worker(worker)
 
-    def _pip_list(self, stdout, stderr, prefix=None):
-        """Callback for `pip_list`."""
-        result = stdout  # A dict
-        linked = self.linked(prefix)
+    def pip_packages(self, prefix):
+        """
+        Return the canonical names of the pip only packages in `prefix`.
 
+        Names are `name-version-pip`, packages also linked by conda are not
+        included. Site-packages folders are only read again if they changed.
+        """
+        snapshot = self._snapshots.get(prefix)
         pip_only = []
 
-        linked_names = [self.split_canonical_name(l)[0] for l in linked]
-
-        for pkg in result:
+        for pkg in self._site_packages.get(prefix):
             name = self.split_canonical_name(pkg)[0]
-            if name not in linked_names:
+            if name not in snapshot:
                 pip_only.append(pkg)
-            # FIXME: NEED A MORE ROBUST WAY!
-#            if '<pip>' in line and '#' not in line:
-#                temp = line.split()[:-1] + ['pip']
-#                temp = '-'.join(temp)
-#                if '-(' in temp:
-#                    start = temp.find('-(')
-#                    end = temp.find(')')
-#                    substring = temp[start:end+1]
-#                    temp = temp.replace(substring, '')
-#                result.append(temp)
 
         return pip_only
 
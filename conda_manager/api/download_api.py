@@ -8,22 +8,39 @@
 """Worker threads for downloading files."""
 
 # Standard library imports
-from collections import deque
+import itertools
 import json
 import os
 import re
 import sys
+import threading
 
 # Third party imports
-from qtpy.QtCore import QByteArray, QObject, QThread, QTimer, QUrl, Signal
+from qtpy.QtCore import QByteArray, QObject, QThread, QUrl, Signal
 from qtpy.QtNetwork import (QNetworkAccessManager, QNetworkProxy,
                             QNetworkProxyFactory, QNetworkRequest)
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
 # Local imports
 from conda_manager.api.conda_api import CondaAPI
 from conda_manager.utils.logs import logger
-from conda_manager.utils.py3compat import to_text_string
+from conda_manager.utils.misc import replace_file
+from conda_manager.utils.py3compat import to_text_string, urlparse
+from conda_manager.utils.repodata import (clear_cache_headers,
+                                          conditional_headers,
+                                          is_cache_fresh, save_cache_headers,
+                                          touch_cache_headers)
+from conda_manager.utils.threads import WorkerThreads
+
+# Scheduling priorities of the requests download workers, lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Suffix of the file used while a download is in progress
+PART_SUFFIX = '.part'
 
 PROXY_RE = re.compile(r'(?P<scheme>.*?)://'
                       '((?P<username>.*):(?P<password>.*)@)?'
@@ -198,12 +215,9 @@ class _DownloadAPI(QObject):
         self._load_rc_func = load_rc_func
         self._manager = QNetworkAccessManager(self)
         self._proxy_factory = NetworkProxyFactory(load_rc_func=load_rc_func)
-        self._timer = QTimer()
 
         # Setup
         self._manager.setProxyFactory(self._proxy_factory)
-        self._timer.setInterval(1000)
-        self._timer.timeout.connect(self._clean)
 
         # Signals
         self._manager.finished.connect(self._request_finished)
@@ -226,19 +240,12 @@ class _DownloadAPI(QObject):
                           proxy,
                           authenticator)))
 
-    def _clean(self):
-        """Check for inactive workers and remove their references."""
-        if self._workers:
-            for url in self._workers.copy():
-                w = self._workers[url]
-                if w.is_finished():
-                    self._workers.pop(url)
-                    self._paths.pop(url)
-                    if url in self._get_requests:
-                        self._get_requests.pop(url)
-
-        else:
-            self._timer.stop()
+    def _remove(self, url):
+        """Remove the references of the finished worker of `url`."""
+        self._workers.pop(url, None)
+        self._paths.pop(url, None)
+        self._head_requests.pop(url, None)
+        self._get_requests.pop(url, None)
 
     def _request_finished(self, reply):
         """Callback for download once the request has finished."""
@@ -254,6 +261,8 @@ class _DownloadAPI(QObject):
 #            print(url, error)
             if error:
                 logger.error(str(('Head Reply Error:', error)))
+                worker.finished = True
+                self._remove(url)
                 worker.sig_download_finished.emit(url, path)
                 worker.sig_finished.emit(worker, path, error)
                 return
@@ -291,6 +300,7 @@ class _DownloadAPI(QObject):
             else:
                 # File sizes match, dont download file or error?
                 worker.finished = True
+                self._remove(url)
                 worker.sig_download_finished.emit(url, path)
                 worker.sig_finished.emit(worker, path, None)
         elif url in self._get_requests:
@@ -311,11 +321,9 @@ class _DownloadAPI(QObject):
 
         # Clean up
         worker.finished = True
+        self._remove(url)
         worker.sig_download_finished.emit(url, path)
         worker.sig_finished.emit(worker, path, None)
-        self._get_requests.pop(url)
-        self._workers.pop(url)
-        self._paths.pop(url)
 
     @staticmethod
     def _progress(bytes_received, bytes_total, worker):
@@ -347,7 +355,6 @@ class _DownloadAPI(QObject):
         self._paths[url] = path
         self._workers[url] = worker
         self._manager.head(request)
-        self._timer.start()
 
         return worker
 
@@ -356,6 +363,12 @@ class _DownloadAPI(QObject):
         pass
 
 
+class DownloadCancelled(Exception):
+    """Download was cancelled by the user."""
+
+    pass
+
+
 class RequestsDownloadWorker(QObject):
     """Download Worker based on requests."""
 
@@ -369,12 +382,18 @@ class RequestsDownloadWorker(QObject):
         self.method = method
         self.args = args
         self.kwargs = kwargs
+        self.cancel_event = kwargs.get('cancel_event')
         self._is_finished = False
 
     def is_finished(self):
         """Return True if worker status is finished otherwise return False."""
         return self._is_finished
 
+    def cancel(self):
+        """Ask the running method to stop, if it supports cancellation."""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
     def start(self):
         """Start process worker for given method args and kwargs."""
         error = None
@@ -388,29 +407,53 @@ class RequestsDownloadWorker(QObject):
                               self.method.__module__,
                               error)))
 
-        self.sig_finished.emit(self, output, error)
         self._is_finished = True
+        self.sig_finished.emit(self, output, error)
 
 
 class _RequestsDownloadAPI(QObject):
-    """Download API based on requests."""
-
-    _sig_download_finished = Signal(str, str)
-    _sig_download_progress = Signal(str, str, int, int)
-
-    def __init__(self, load_rc_func=None):
+    """
+    Download API based on requests.
+
+    Workers are run by a scheduler with a pool of `max_workers` threads and at
+    most `max_workers_per_host` concurrent workers for any given host. Queued
+    workers are started in order of priority.
+    """
+
+    # Emitted once all the queued and running workers have finished
+    sig_batch_finished = Signal()
+
+    MAX_WORKERS = 8
+    MAX_WORKERS_PER_HOST = 6
+
+    # Http session settings
+    POOL_CONNECTIONS = 10
+    MAX_RETRIES = 3
+    RETRY_BACKOFF_FACTOR = 0.5
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+    def __init__(self, load_rc_func=None, max_workers=MAX_WORKERS,
+                 max_workers_per_host=MAX_WORKERS_PER_HOST,
+                 pool_connections=POOL_CONNECTIONS, max_retries=MAX_RETRIES,
+                 backoff_factor=RETRY_BACKOFF_FACTOR):
         """Download API based on requests."""
         super(QObject, self).__init__()
         self._conda_api = CondaAPI()
-        self._queue = deque()
-        self._threads = []
-        self._workers = []
-        self._timer = QTimer()
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._pool_connections = pool_connections
+        self._max_retries = max_retries
+        self._backoff_factor = backoff_factor
+        self._counter = itertools.count()
+        self._queue = []
+        self._running = {}
+        self._host_count = {}
+        self._threads = WorkerThreads(self)
 
         self._load_rc_func = load_rc_func
         self._chunk_size = 1024
-        self._timer.setInterval(1000)
-        self._timer.timeout.connect(self._clean)
+        self._max_workers = max_workers
+        self._max_workers_per_host = max_workers_per_host
 
     @property
     def proxy_servers(self):
@@ -420,45 +463,102 @@ class _RequestsDownloadAPI(QObject):
         else:
             return self._load_rc_func().get('proxy_servers', {})
 
-    def _clean(self):
-        """Check for inactive workers and remove their references."""
-        if self._workers:
-            for w in self._workers:
-                if w.is_finished():
-                    self._workers.remove(w)
-
-        if self._threads:
-            for t in self._threads:
-                if t.isFinished():
-                    self._threads.remove(t)
-        else:
-            self._timer.stop()
+    @property
+    def session(self):
+        """
+        Return the http session for the current proxy servers.
+
+        Sessions keep a pool of open connections per host and are shared by
+        all the worker threads, so one session exists per proxy setting.
+        """
+        proxies = self.proxy_servers or {}
+        key = tuple(sorted(proxies.items()))
+
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session(proxies)
+                self._sessions[key] = session
+
+        return session
+
+    def _create_session(self, proxies):
+        """Create a pooled http session with a retry policy."""
+        retry = Retry(total=self._max_retries,
+                      backoff_factor=self._backoff_factor,
+                      status_forcelist=self.RETRY_STATUS_CODES)
+
+        # Connections are only reused if every worker on a host can get one
+        # back from the pool, hence the pool size per host
+        adapter = HTTPAdapter(pool_connections=self._pool_connections,
+                              pool_maxsize=max(self._max_workers_per_host,
+                                               self._max_workers),
+                              max_retries=retry)
+
+        session = requests.Session()
+        session.proxies = dict(proxies)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
 
     def _start(self):
-        """Start the next threaded worker in the queue."""
-        if len(self._queue) == 1:
-            thread = self._queue.popleft()
+        """Start queued workers while there are free slots in the pool."""
+        while self._queue and len(self._running) < self._max_workers:
+            # Queue entries are (priority, counter, host, worker, thread)
+            available = [entry for entry in self._queue if
+                         self._host_count.get(entry[2], 0) <
+                         self._max_workers_per_host]
+
+            if not available:
+                break
+
+            entry = min(available)
+            self._queue.remove(entry)
+            priority, counter, host, worker, thread = entry
+            self._running[worker] = (host, thread)
+            self._host_count[host] = self._host_count.get(host, 0) + 1
             thread.start()
-            self._timer.start()
 
-    def _create_worker(self, method, *args, **kwargs):
-        """Create a new worker instance."""
+    def _worker_finished(self, worker, output, error):
+        """Callback for a finished worker, to free its slot in the pool."""
+        if worker not in self._running:
+            return
+
+        host, thread = self._running.pop(worker)
+        self._host_count[host] -= 1
+        self._start()
+
+        if not self._running and not self._queue:
+            self.sig_batch_finished.emit()
+
+    def _create_worker(self, priority, url, method, *args, **kwargs):
+        """Create a new worker instance and schedule it."""
         thread = QThread()
         worker = RequestsDownloadWorker(method, args, kwargs)
         worker.moveToThread(thread)
-        worker.sig_finished.connect(self._start)
-        self._sig_download_finished.connect(worker.sig_download_finished)
-        self._sig_download_progress.connect(worker.sig_download_progress)
+        worker.sig_finished.connect(self._worker_finished)
+
+        # Downloads report their progress through the worker running them
+        if 'worker' in kwargs:
+            kwargs['worker'] = worker
         worker.sig_finished.connect(thread.quit)
         thread.started.connect(worker.start)
-        self._queue.append(thread)
-        self._threads.append(thread)
-        self._workers.append(worker)
+
+        host = urlparse(url).netloc if url else ''
+        self._queue.append((priority, next(self._counter), host, worker,
+                            thread))
+        self._threads.add(thread, worker)
         self._start()
         return worker
 
-    def _download(self, url, path=None, force=False):
-        """Callback for download."""
+    def _download(self, url, path=None, force=False, conditional=False,
+                  ttl=None, cancel_event=None, worker=None):
+        """
+        Callback for download.
+
+        The progress and the end of the download are emitted by `worker`,
+        so only the connections made to that worker are notified.
+        """
         if path is None:
             path = url.split('/')[-1]
 
@@ -468,45 +568,81 @@ class _RequestsDownloadAPI(QObject):
         if not os.path.isdir(folder):
             os.makedirs(folder)
 
+        headers = {}
+        if conditional and not force:
+            # Skip the network entirely if the cached file is still fresh
+            if is_cache_fresh(path, url, ttl=ttl):
+                worker.sig_download_finished.emit(url, path)
+                return path
+            headers = conditional_headers(path, url)
+
         # Start actual download
         try:
-            r = requests.get(url, stream=True, proxies=self.proxy_servers)
+            r = self.session.get(url, stream=True, headers=headers)
         except Exception as error:
-            print('ERROR', 'here', error)
+            # Connection errors and exhausted retries, the worker emits the
+            # error with `sig_finished`
             logger.error(str(error))
-            # Break if error found!
-#            self._sig_download_finished.emit(url, path)
-#            return path
+            raise
 
         total_size = int(r.headers.get('Content-Length', 0))
 
-        # Check if file exists
-        if os.path.isfile(path) and not force:
+        if conditional:
+            if r.status_code == 304:
+                # Not modified, so the file on disk is still valid
+                touch_cache_headers(path, url, r.headers)
+                worker.sig_download_finished.emit(url, path)
+                return path
+
+            # Do not overwrite valid data with an error page
+            r.raise_for_status()
+
+            # Cache headers are only stored once the file is fully written
+            clear_cache_headers(path)
+        elif os.path.isfile(path) and not force:
+            # Check if file exists
             file_size = os.path.getsize(path)
 
             # Check if existing file matches size of requested file
             if file_size == total_size:
-                self._sig_download_finished.emit(url, path)
+                worker.sig_download_finished.emit(url, path)
                 return path
 
         # File not found or file size did not match. Download file.
+        # Data is written to a partial file first, so a cancelled or failed
+        # download never leaves a truncated file at `path`
+        part_path = path + PART_SUFFIX
         progress_size = 0
-        with open(path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=self._chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    progress_size += len(chunk)
-                    self._sig_download_progress.emit(url, path,
-                                                     progress_size,
-                                                     total_size)
-            self._sig_download_finished.emit(url, path)
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=self._chunk_size):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise DownloadCancelled(url)
+                    if chunk:
+                        f.write(chunk)
+                        progress_size += len(chunk)
+                        worker.sig_download_progress.emit(url, path,
+                                                          progress_size,
+                                                          total_size)
+        except Exception:
+            r.close()
+            if os.path.isfile(part_path):
+                os.remove(part_path)
+            raise
+
+        replace_file(part_path, path)
+
+        if conditional:
+            save_cache_headers(path, url, r.headers)
+
+        worker.sig_download_finished.emit(url, path)
 
         return path
 
     def _is_valid_url(self, url):
         """Callback for is_valid_url."""
         try:
-            r = requests.head(url, proxies=self.proxy_servers)
+            r = self.session.head(url)
             value = r.status_code in [200]
         except Exception as error:
             logger.error(str(error))
@@ -529,7 +665,7 @@ class _RequestsDownloadAPI(QObject):
         repodata_url = "{0}/{1}/{2}".format(url, plat, 'repodata.json')
 
         try:
-            r = requests.head(repodata_url, proxies=self.proxy_servers)
+            r = self.session.head(repodata_url)
             value = r.status_code in [200]
         except Exception as error:
             logger.error(str(error))
@@ -542,7 +678,7 @@ class _RequestsDownloadAPI(QObject):
         # Check response is a JSON with ok: 1
         data = {}
         try:
-            r = requests.get(url, proxies=self.proxy_servers)
+            r = self.session.get(url)
             content = to_text_string(r.content, encoding='utf-8')
             data = json.loads(content)
         except Exception as error:
@@ -552,54 +688,119 @@ class _RequestsDownloadAPI(QObject):
 
     # --- Public API
     # -------------------------------------------------------------------------
-    def download(self, url, path=None, force=False):
-        """Download file given by url and save it to path."""
-        logger.debug(str((url, path, force)))
+    def download(self, url, path=None, force=False, conditional=False,
+                 ttl=None, priority=PRIORITY_NORMAL):
+        """
+        Download file given by url and save it to path.
+
+        If `conditional` is True, the ETag/Last-Modified headers stored with
+        a previous download are used so that the file is only transferred if
+        it changed on the server. If the previous download is younger than
+        `ttl` seconds (or than the `max-age` sent by the server if `ttl` is
+        None), no request is made at all.
+        """
+        logger.debug(str((url, path, force, conditional, ttl, priority)))
         method = self._download
-        return self._create_worker(method, url, path=path, force=force)
+        return self._create_worker(priority, url, method, url, path=path,
+                                   force=force, conditional=conditional,
+                                   ttl=ttl, cancel_event=threading.Event(),
+                                   worker=None)
 
     def terminate(self):
-        """Terminate all workers and threads."""
-        for t in self._threads:
+        """
+        Terminate all workers and threads.
+
+        Queued workers are dropped and finish with a `DownloadCancelled`
+        error, running downloads are stopped at the next chunk.
+        """
+        queue = self._queue
+        self._queue = []
+
+        for priority, counter, host, worker, thread in queue:
+            # These threads were never started
+            self._threads.discard(thread)
+            worker._is_finished = True
+            worker.sig_finished.emit(worker, None,
+                                     DownloadCancelled('Cancelled'))
+
+        for worker in list(self._running):
+            worker.cancel()
+
+        for t in self._threads.threads():
             t.quit()
-        self._thread = []
-        self._workers = []
 
-    def is_valid_url(self, url, non_blocking=True):
+        if queue and not self._running:
+            self.sig_batch_finished.emit()
+
+    def is_valid_url(self, url, non_blocking=True, priority=PRIORITY_LOW):
         """Check if url is valid."""
         logger.debug(str((url)))
         if non_blocking:
             method = self._is_valid_url
-            return self._create_worker(method, url)
+            return self._create_worker(priority, url, method, url)
         else:
             return self._is_valid_url(url)
 
-    def is_valid_api_url(self, url, non_blocking=True):
+    def is_valid_api_url(self, url, non_blocking=True,
+                         priority=PRIORITY_LOW):
         """Check if anaconda api url is valid."""
         logger.debug(str((url)))
         if non_blocking:
             method = self._is_valid_api_url
-            return self._create_worker(method, url)
+            return self._create_worker(priority, url, method, url)
         else:
             return self._is_valid_api_url(url=url)
 
     def is_valid_channel(self,
                          channel,
                          conda_url='https://conda.anaconda.org',
-                         non_blocking=True):
+                         non_blocking=True,
+                         priority=PRIORITY_LOW):
         """Check if a conda channel is valid."""
         logger.debug(str((channel, conda_url)))
         if non_blocking:
             method = self._is_valid_channel
-            return self._create_worker(method, channel, conda_url)
+            return self._create_worker(priority, conda_url, method, channel,
+                                       conda_url)
         else:
             return self._is_valid_channel(channel, conda_url=conda_url)
 
+    def session_stats(self):
+        """
+        Return connection statistics of the http sessions.
+
+        `requests` is the number of requests made and `connections` the
+        number of connections opened for them, so the difference is the
+        number of requests that reused a kept-alive connection.
+        """
+        stats = {'connections': 0, 'requests': 0, 'hosts': 0}
+
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                # Connections made through a proxy have their own managers
+                managers = [adapter.poolmanager]
+                managers.extend(adapter.proxy_manager.values())
+                for manager in managers:
+                    pools = manager.pools
+                    for key in pools.keys():
+                        pool = pools.get(key)
+                        if pool is None:
+                            continue
+                        stats['hosts'] += 1
+                        stats['connections'] += pool.num_connections
+                        stats['requests'] += pool.num_requests
+
+        stats['reused'] = stats['requests'] - stats['connections']
+        return stats
+
     def get_api_info(self, url):
         """Query anaconda api info."""
         data = {}
         try:
-            r = requests.get(url, proxies=self.proxy_servers)
+            r = self.session.get(url)
             content = to_text_string(r.content, encoding='utf-8')
             data = json.loads(content)
             if not data:
@@ -626,12 +827,18 @@ def DownloadAPI(load_rc_func=None):
     return DOWNLOAD_API
 
 
-def RequestsDownloadAPI(load_rc_func=None):
+def RequestsDownloadAPI(load_rc_func=None,
+                        max_workers=_RequestsDownloadAPI.MAX_WORKERS,
+                        max_workers_per_host=(
+                            _RequestsDownloadAPI.MAX_WORKERS_PER_HOST)):
     """Download API threaded worker based on requests."""
     global REQUESTS_DOWNLOAD_API
 
     if REQUESTS_DOWNLOAD_API is None:
-        REQUESTS_DOWNLOAD_API = _RequestsDownloadAPI(load_rc_func=load_rc_func)
+        REQUESTS_DOWNLOAD_API = _RequestsDownloadAPI(
+            load_rc_func=load_rc_func,
+            max_workers=max_workers,
+            max_workers_per_host=max_workers_per_host)
 
     return REQUESTS_DOWNLOAD_API
 
@@ -18,7 +18,10 @@ from qtpy.QtCore import QObject, Signal
 # Local imports
 from conda_manager.api.client_api import ClientAPI
 from conda_manager.api.conda_api import CondaAPI
-from conda_manager.api.download_api import DownloadAPI, RequestsDownloadAPI
+from conda_manager.api.download_api import (DownloadAPI, PRIORITY_HIGH,
+                                            RequestsDownloadAPI)
+from conda_manager.api.watcher_api import WatcherAPI
+from conda_manager.utils.logs import logger
 
 
 class _ManagerAPI(QObject):
@@ -26,6 +29,7 @@ class _ManagerAPI(QObject):
 
     sig_repodata_updated = Signal(object)
     sig_repodata_errored = Signal()
+    sig_environment_changed = Signal(str, object)  # prefix, kinds
 
     def __init__(self):
         """Anaconda Manager API process worker."""
@@ -37,14 +41,13 @@ class _ManagerAPI(QObject):
         self._download_api = DownloadAPI(load_rc_func=self._conda_api.load_rc)
         self._requests_download_api = RequestsDownloadAPI(
             load_rc_func=self._conda_api.load_rc)
+        self._watcher_api = WatcherAPI()
         self.ROOT_PREFIX = self._conda_api.ROOT_PREFIX
 
         # Vars
-        self._checking_repos = None
         self._data_directory = None
         self._files_downloaded = None
         self._repodata_files = None
-        self._valid_repos = None
 
         # Expose some methods for convenient access. Methods return a worker
         self.conda_create = self._conda_api.create
@@ -67,6 +70,7 @@ class _ManagerAPI(QObject):
         self.conda_linked = self._conda_api.linked
         self.conda_get_prefix_envname = self._conda_api.get_prefix_envname
         self.conda_package_version = self._conda_api.package_version
+        self.conda_environment_snapshot = self._conda_api.environment_snapshot
         self.conda_platform = self._conda_api.get_platform
 
         # These download methods return a worker
@@ -101,6 +105,11 @@ class _ManagerAPI(QObject):
         self.client_get_api_url = self._client_api.get_api_url
         self.client_set_api_url = self._client_api.set_api_url
 
+        # Environments changed by other processes
+        self.watcher_set_prefixes = self._watcher_api.set_prefixes
+        self._watcher_api.sig_environment_changed.connect(
+            self.sig_environment_changed)
+
     # --- Helper methods
     # -------------------------------------------------------------------------
     def _set_repo_urls_from_channels(self, channels):
@@ -118,28 +127,6 @@ class _ManagerAPI(QObject):
 
         return repos
 
-    def _check_repos(self, repos):
-        """Check if repodata urls are valid."""
-        self._checking_repos = []
-        self._valid_repos = []
-
-        for repo in repos:
-            worker = self.download_is_valid_url(repo)
-            worker.sig_finished.connect(self._repos_checked)
-            worker.repo = repo
-            self._checking_repos.append(repo)
-
-    def _repos_checked(self, worker, output, error):
-        """Callback for _check_repos."""
-        if worker.repo in self._checking_repos:
-            self._checking_repos.remove(worker.repo)
-
-        if output:
-            self._valid_repos.append(worker.repo)
-
-        if len(self._checking_repos) == 0:
-            self._download_repodata(self._valid_repos)
-
     def _repo_url_to_path(self, repo):
         """Convert a `repo` url to a file path for local storage."""
         repo = repo.replace('http://', '')
@@ -148,26 +135,30 @@ class _ManagerAPI(QObject):
 
         return os.sep.join([self._data_directory, repo])
 
-    def _download_repodata(self, checked_repos):
-        """Dowload repodata."""
+    def _download_repodata(self, repos, ttl=None):
+        """
+        Download repodata.
+
+        A single conditional request is made per repo, so files are only
+        transferred if they changed on the server.
+        """
         self._files_downloaded = []
         self._repodata_files = []
-        self.__counter = -1
-
-        if checked_repos:
-            for repo in checked_repos:
-                path = self._repo_url_to_path(repo)
-                self._files_downloaded.append(path)
-                self._repodata_files.append(path)
-                worker = self.download_async(repo, path)
-                worker.url = repo
-                worker.path = path
-                worker.sig_finished.connect(self._repodata_downloaded)
-        else:
-            # Empty, maybe there is no internet connection
-            # Load information from conda-meta and save that file
-            path = self._get_repodata_from_meta()
-            self._repodata_files = [path]
+
+        for repo in repos:
+            path = self._repo_url_to_path(repo)
+            if path in self._repodata_files:
+                continue
+
+            self._files_downloaded.append(path)
+            self._repodata_files.append(path)
+            worker = self.download_requests(repo, path, conditional=True,
+                                            ttl=ttl, priority=PRIORITY_HIGH)
+            worker.url = repo
+            worker.path = path
+            worker.sig_finished.connect(self._repodata_downloaded)
+
+        if not repos:
             self._repodata_downloaded()
 
     def _get_repodata_from_meta(self):
@@ -203,13 +194,21 @@ class _ManagerAPI(QObject):
     def _repodata_downloaded(self, worker=None, output=None, error=None):
         """Callback for _download_repodata."""
         if worker:
-            self._files_downloaded.remove(worker.path)
+            if error:
+                logger.error(str((worker.url, error)))
 
             if worker.path in self._files_downloaded:
                 self._files_downloaded.remove(worker.path)
 
         if len(self._files_downloaded) == 0:
-            self.sig_repodata_updated.emit(list(set(self._repodata_files)))
+            paths = [p for p in self._repodata_files if os.path.isfile(p)]
+
+            if not paths:
+                # Empty, maybe there is no internet connection
+                # Load information from conda-meta and save that file
+                paths = [self._get_repodata_from_meta()]
+
+            self.sig_repodata_updated.emit(paths)
 
     # --- Public API
     # -------------------------------------------------------------------------
@@ -236,12 +235,17 @@ class _ManagerAPI(QObject):
         """Set the directory where repodata and metadata are stored."""
         self._data_directory = data_directory
 
-    def update_repodata(self, channels=None):
-        """Update repodata from channels or use condarc channels if None."""
+    def update_repodata(self, channels=None, ttl=None):
+        """
+        Update repodata from channels or use condarc channels if None.
+
+        Repodata downloaded less than `ttl` seconds ago is not requested again.
+        If `ttl` is None, the `Cache-Control` header of the server is used.
+        """
         norm_channels = self.conda_get_condarc_channels(channels=channels,
                                                         normalize=True)
         repodata_urls = self._set_repo_urls_from_channels(norm_channels)
-        self._check_repos(repodata_urls)
+        self._download_repodata(repodata_urls, ttl=ttl)
 
     def update_metadata(self):
         """
@@ -254,7 +258,8 @@ class _ManagerAPI(QObject):
 
         metadata_url = 'https://repo.continuum.io/pkgs/metadata.json'
         filepath = os.sep.join([self._data_directory, 'metadata.json'])
-        worker = self.download_requests(metadata_url, filepath)
+        worker = self.download_requests(metadata_url, filepath,
+                                        priority=PRIORITY_HIGH)
         return worker
 
     def check_valid_channel(self,
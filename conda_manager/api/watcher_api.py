@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Watch conda environments for changes made outside of the package manager.
+
+The `conda-meta` folder (and its `history` file) and the site-packages
+folders of the watched prefixes are monitored with a QFileSystemWatcher.
+Changes are debounced and reported once per prefix.
+"""
+
+# Standard library imports
+import os
+
+# Third party imports
+from qtpy.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+
+# Local imports
+from conda_manager.utils.logs import logger
+from conda_manager.utils.sitepackages import site_packages_dirs
+
+
+class _WatcherAPI(QObject):
+    """Watch conda environments for changes made by other processes."""
+
+    # Time without new events (ms) before a change is reported
+    DELAY = 750
+
+    # prefix, kinds of changes ('conda' and/or 'pip')
+    sig_environment_changed = Signal(str, object)
+
+    def __init__(self, delay=DELAY):
+        """Watch conda environments for changes made by other processes."""
+        super(_WatcherAPI, self).__init__()
+        self._watcher = QFileSystemWatcher(self)
+        self._timer = QTimer(self)
+        self._paths = {}     # {path: (prefix, kind)}
+        self._pending = {}   # {prefix: set of kinds}
+
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+
+        # Signals
+        self._timer.timeout.connect(self._emit_changes)
+        self._watcher.directoryChanged.connect(self._path_changed)
+        self._watcher.fileChanged.connect(self._path_changed)
+
+    def _watch_paths(self, prefix):
+        """Return the `{path: (prefix, kind)}` watched for `prefix`."""
+        meta_dir = os.path.join(prefix, 'conda-meta')
+        paths = {meta_dir: (prefix, 'conda'),
+                 os.path.join(meta_dir, 'history'): (prefix, 'conda')}
+        for path in site_packages_dirs(prefix):
+            paths[path] = (prefix, 'pip')
+        return dict((p, v) for p, v in paths.items() if os.path.exists(p))
+
+    def _path_changed(self, path):
+        """Callback for a changed file or folder."""
+        path = os.path.normpath(path)
+        if path not in self._paths:
+            return
+
+        prefix, kind = self._paths[path]
+        self._pending.setdefault(prefix, set()).add(kind)
+
+        # Files replaced by a new one are no longer watched
+        if os.path.exists(path) and path not in self._watched():
+            self._watcher.addPath(path)
+
+        self._timer.start()
+
+    def _watched(self):
+        """Return the paths being watched."""
+        paths = self._watcher.files() + self._watcher.directories()
+        return set(os.path.normpath(p) for p in paths)
+
+    def _emit_changes(self):
+        """Report the changes accumulated since the last report."""
+        pending, self._pending = self._pending, {}
+        for prefix, kinds in pending.items():
+            logger.debug(str((prefix, kinds)))
+            self.sig_environment_changed.emit(prefix, frozenset(kinds))
+
+    # --- Public API
+    # -------------------------------------------------------------------------
+    def set_prefixes(self, prefixes):
+        """Watch the environments in `prefixes`, and only those."""
+        paths = {}
+        for prefix in prefixes:
+            if prefix:
+                paths.update(self._watch_paths(prefix))
+        paths = dict((os.path.normpath(p), v) for p, v in paths.items())
+
+        watched = self._watched()
+        removed = [p for p in watched if p not in paths]
+        added = [p for p in paths if p not in watched]
+        if removed:
+            self._watcher.removePaths(removed)
+        if added:
+            self._watcher.addPaths(added)
+
+        self._paths = paths
+        self._pending = dict((p, k) for p, k in self._pending.items()
+                             if p in prefixes)
+
+    def prefixes(self):
+        """Return the watched prefixes."""
+        return sorted(set(prefix for prefix, kind in self._paths.values()))
+
+    def clear(self):
+        """Stop watching all the environments."""
+        self.set_prefixes([])
+
+
+WATCHER_API = None
+
+
+def WatcherAPI():
+    """Environment watcher API."""
+    global WATCHER_API
+
+    if WATCHER_API is None:
+        WATCHER_API = _WatcherAPI()
+
+    return WATCHER_API
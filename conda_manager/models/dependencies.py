@@ -32,6 +32,11 @@ class CondaDependenciesModel(QAbstractTableModel):
         self._packages_sizes = packages_sizes
         self._rows = []
         self._bold_rows = []
+        self._fonts = {}
+        for bold in (False, True):
+            font = QFont()
+            font.setBold(bold)
+            self._fonts[bold] = to_qvariant(font)
         self._timer = QTimer()
         self._timer.timeout.connect(self._timer_update)
         self._timer_dots = ['.  ', '.. ', '...', '   ']
@@ -112,7 +117,7 @@ class CondaDependenciesModel(QAbstractTableModel):
             if u'FETCH' in val:
                 v = val['FETCH']
                 if pkg in self._packages_sizes:
-                    size = self._packages_sizes[pkg].get(v, '-')
+                    size = self._packages_sizes.size(pkg, v, '-')
                     if size != '-':
                         total += size
                         size = human_bytes(size)
@@ -161,13 +166,7 @@ class CondaDependenciesModel(QAbstractTableModel):
         elif role == Qt.ForegroundRole:
             return to_qvariant()
         elif role == Qt.FontRole:
-            font = QFont()
-            if row in self._bold_rows:
-                font.setBold(True)
-                return to_qvariant(font)
-            else:
-                font.setBold(False)
-                return to_qvariant(font)
+            return self._fonts[row in self._bold_rows]
         return to_qvariant()
 
     def rowCount(self, index=QModelIndex()):
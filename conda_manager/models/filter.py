@@ -10,11 +10,202 @@ MultiColumnSortFilterProxy Implements a QSortFilterProxyModel that allows for
 custom filtering on several columns.
 """
 
+# Standard library imports
+from bisect import bisect_right
+
 # Third party imports
-from qtpy.QtCore import QSortFilterProxyModel
+from qtpy.QtCore import QSortFilterProxyModel, QTimer, Signal
 
 # Local imports
 from conda_manager.utils import constants
+from conda_manager.utils.py3compat import to_text_string
+
+
+class _SearchColumn(object):
+    """
+    Lowercased text of a column packed in a single string.
+
+    Rows containing a token are found with `str.find` over the packed text
+    instead of testing every row.
+    """
+
+    SEPARATOR = u'\n'
+    MIN_FIND_LENGTH = 3
+
+    def __init__(self, values):
+        """Lowercased text of a column packed in a single string."""
+        self.values = [to_text_string(v).lower().replace(self.SEPARATOR, u' ')
+                       for v in values]
+        self.offsets = []
+        position = 0
+        for value in self.values:
+            self.offsets.append(position)
+            position += len(value) + 1
+        self.offsets.append(position)
+        self.text = self.SEPARATOR.join(self.values)
+
+    def rows(self, token, candidates, bounds=None):
+        """
+        Return the rows of `candidates` containing `token`.
+
+        `bounds` are the (first, last) rows of `candidates`, if known.
+        """
+        if not candidates:
+            return set()
+
+        # Only the text between the first and last candidates is searched
+        first, last = bounds or (min(candidates), max(candidates))
+
+        # Short tokens match most rows and testing a few candidates is
+        # cheaper than searching the text
+        if (len(token) < self.MIN_FIND_LENGTH or
+                len(candidates) < (last - first + 1) // 8):
+            values = self.values
+            return set(row for row in candidates if token in values[row])
+
+        rows = set()
+        text, offsets = self.text, self.offsets
+        find = text.find
+        end = offsets[last + 1]
+        start = find(token, offsets[first], end)
+        while start >= 0:
+            row = bisect_right(offsets, start) - 1
+            rows.add(row)
+            # Jump to the next row, this one already matched
+            start = find(token, offsets[row + 1], end)
+        return rows & candidates
+
+
+def _tokens(text):
+    """Return the search words of `text`, longest first."""
+    # Longer tokens match fewer rows, so they narrow the search faster
+    return sorted(set(to_text_string(text).lower().split()), key=len,
+                  reverse=True)
+
+
+def narrows(text, previous_text):
+    """
+    Return True if the matches of `text` are a subset of `previous_text`.
+
+    This is the case when every word of `previous_text` is contained in a
+    word of `text`, e.g. when the user keeps typing.
+    """
+    tokens = _tokens(text)
+    return all(any(old in new for new in tokens)
+               for old in _tokens(previous_text))
+
+
+class SearchIndex(object):
+    """
+    Search index of the name, description and status of the packages rows.
+
+    Built once per model load. A `SearchQuery` finds the rows matching all
+    the words of the text either in the name or in the description, with a
+    status in the given statuses.
+    """
+
+    def __init__(self, names, descriptions, statuses):
+        """Search index of the name, description and status of the rows."""
+        self._names = _SearchColumn(names)
+        self._descriptions = _SearchColumn(descriptions)
+        self._statuses = list(statuses)
+        self._status_rows = {}
+        for row, status in enumerate(self._statuses):
+            self._status_rows.setdefault(status, set()).add(row)
+
+    def __len__(self):
+        """Return the number of rows in the index."""
+        return len(self._statuses)
+
+    def set_status(self, row, status):
+        """Update the status of `row`."""
+        old_status = self._statuses[row]
+        if old_status != status:
+            self._status_rows[old_status].discard(row)
+            self._status_rows.setdefault(status, set()).add(row)
+            self._statuses[row] = status
+
+    def status_rows(self, statuses):
+        """Return the set of rows with a status in `statuses`."""
+        rows = set()
+        for status in statuses:
+            rows.update(self._status_rows.get(status, ()))
+        return rows
+
+    def _column_rows(self, column, tokens, candidates, bounds):
+        """Return the rows of `candidates` containing all `tokens`."""
+        rows = candidates
+        for token in tokens:
+            rows = column.rows(token, rows, bounds=bounds)
+            if not rows:
+                break
+        return rows
+
+    def match(self, tokens, candidates, bounds=None):
+        """
+        Return the rows of `candidates` matching all `tokens`.
+
+        `bounds` are the (first, last) rows of `candidates`, if known.
+        """
+        if not tokens or not candidates:
+            return set(candidates)
+
+        if bounds is None:
+            bounds = (min(candidates), max(candidates))
+
+        return (self._column_rows(self._names, tokens, candidates, bounds) |
+                self._column_rows(self._descriptions, tokens, candidates,
+                                  bounds))
+
+    def start_query(self, text, statuses, candidates=None, chunk_size=None):
+        """
+        Return a `SearchQuery` of `text` and `statuses`, to run in chunks.
+
+        If `candidates` is given, only those rows are considered.
+        """
+        return SearchQuery(self, text, statuses, candidates=candidates,
+                           chunk_size=chunk_size)
+
+
+class SearchQuery(object):
+    """
+    A query of a `SearchIndex` evaluated over chunks of rows.
+
+    Every call to `step` matches the next `chunk_size` candidate rows, so a
+    long query can be spread over several iterations of the event loop.
+    """
+
+    def __init__(self, index, text, statuses, candidates=None,
+                 chunk_size=None):
+        """A query of a `SearchIndex` evaluated over chunks of rows."""
+        self.text = text
+        self.statuses = tuple(statuses)
+        self.rows = set()
+        self._index = index
+        self._tokens = _tokens(text)
+
+        pending = index.status_rows(statuses)
+        if candidates is not None:
+            pending &= candidates
+        # Sorted, so every chunk covers a contiguous part of the text
+        self._pending = sorted(pending)
+        self._position = 0
+        self._chunk_size = chunk_size or len(self._pending) or 1
+
+    def is_finished(self):
+        """Return True if all the candidate rows have been matched."""
+        return self._position >= len(self._pending)
+
+    def step(self):
+        """Match the next chunk of rows, return True if finished."""
+        start = self._position
+        stop = start + self._chunk_size
+        pending = self._pending[start:stop]
+        if pending:
+            self.rows |= self._index.match(self._tokens, set(pending),
+                                           bounds=(pending[0], pending[-1]))
+        self._position = stop
+        return self.is_finished()
 
 
 class MultiColumnSortFilterProxy(QSortFilterProxyModel):
@@ -33,25 +224,125 @@ class MultiColumnSortFilterProxy(QSortFilterProxyModel):
 
     Copyright https://gist.github.com/dbridges/4732790
     """
+    # Time without changes (ms) before a delayed filter is applied
+    FILTER_DELAY = 200
+
+    # Number of rows matched per iteration of the event loop
+    FILTER_CHUNK_SIZE = 5000
+
+    sig_filter_finished = Signal()
+
     def __init__(self, parent=None):
         super(MultiColumnSortFilterProxy, self).__init__(parent)
         # if parent is stored as self.parent then PySide gives the following
         # TypeError: 'CondaPackagesTable' object is not callable
         self._parent = parent
         self._filter_string = ''
-        self._filter_status = constants.ALL
+        self._filter_status = tuple(constants.PACKAGE_STATUS)
         self._filter_functions = {}
+        self._search_index = None
+        self._accepted_rows = None
+        # Filter the accepted rows were computed for
+        self._accepted_filter = None
+        self._query = None
 
-    def set_filter(self, text, status):
+        self._timer_filter = QTimer()
+        self._timer_filter.setSingleShot(True)
+        self._timer_filter.setInterval(self.FILTER_DELAY)
+        self._timer_filter.timeout.connect(self._start_filter)
+        self._timer_chunk = QTimer()
+        self._timer_chunk.setSingleShot(True)
+        self._timer_chunk.setInterval(0)
+        self._timer_chunk.timeout.connect(self._filter_chunk)
+
+    def set_search_index(self, search_index):
+        """
+        Set the `SearchIndex` of the source model rows.
+
+        The text and status filters are answered by the index, instead of
+        calling filter functions for every row.
+        """
+        self._search_index = search_index
+        self.refresh_filter()
+
+    def refresh_filter(self):
+        """Apply the current filter again, ignoring previous results."""
+        self._accepted_rows = None
+        self._accepted_filter = None
+        self._start_filter()
+
+    def is_filtering(self):
+        """Return True if a filter is pending or running."""
+        return self._timer_filter.isActive() or self._query is not None
+
+    def _start_filter(self):
+        """Start a filter pass, cancelling the running one if any."""
+        self._timer_filter.stop()
+        self._timer_chunk.stop()
+        self._query = None
+
+        text, status = self._filter_string, self._filter_status
+        if self._search_index is None:
+            self._accepted_rows = None
+            self._accepted_filter = None
+            self.invalidateFilter()
+            self.sig_filter_finished.emit()
+            return
+
+        # Typing more words or letters can only remove matches, so only
+        # the rows accepted by the previous filter need to be checked
+        candidates = None
+        if self._accepted_filter is not None:
+            accepted_text, accepted_status = self._accepted_filter
+            if (set(status) <= set(accepted_status) and
+                    narrows(text, accepted_text)):
+                candidates = self._accepted_rows
+
+        self._query = self._search_index.start_query(
+            text, status, candidates=candidates,
+            chunk_size=self.FILTER_CHUNK_SIZE)
+        self._filter_chunk()
+
+    def _filter_chunk(self):
+        """Match the next chunk of rows of the running filter pass."""
+        query = self._query
+        if query is None:
+            return
+
+        if not query.step():
+            self._timer_chunk.start()
+            return
+
+        self._query = None
+        self._accepted_rows = query.rows
+        self._accepted_filter = (query.text, query.statuses)
+        self.invalidateFilter()
+        self.sig_filter_finished.emit()
+
+    def set_filter(self, text, status, delayed=False):
         """
         text : string
             The string to be used for pattern matching.
-        status : int
-            TODO: add description
+        status : tuple
+            The package statuses (`constants.PACKAGE_STATUS`) to accept.
+        delayed : bool
+            If True, the filter is applied after `FILTER_DELAY` ms without
+            further changes, so typing does not filter on every key.
+
+        `sig_filter_finished` is emitted once the rows are filtered.
         """
+        if isinstance(status, int):
+            status = (status, )
         self._filter_string = text.lower()
-        self._filter_status = status
-        self.invalidateFilter()
+        self._filter_status = tuple(status)
+
+        if delayed and self._search_index is not None:
+            # Cancel the running pass, its result is already outdated
+            self._timer_chunk.stop()
+            self._query = None
+            self._timer_filter.start()
+        else:
+            self._start_filter()
 
     def add_filter_function(self, name, new_function):
         """
@@ -89,12 +380,18 @@ class MultiColumnSortFilterProxy(QSortFilterProxyModel):
 
         Reimplemented from base class to allow the use of custom filtering.
         """
-        model = self.sourceModel()
+        if (self._accepted_rows is not None and
+                row_num not in self._accepted_rows):
+            return False
+
+        if not self._filter_functions:
+            return True
 
         # The source model should have a method called row()
         # which returns the table row as a python list.
-        tests = [func(model.row(row_num), self._filter_string,
-                 self._filter_status) for func in
-                 self._filter_functions.values()]
+        row = self.sourceModel().row(row_num)
+        for func in self._filter_functions.values():
+            if not func(row, self._filter_string, self._filter_status):
+                return False
 
-        return False not in tests  # Changes this to any or all!
+        return True
@@ -9,6 +9,7 @@
 """
 
 # Standard library imports
+from array import array
 import gettext
 
 # Third party imports
@@ -17,23 +18,132 @@ from qtpy.QtCore import (QAbstractTableModel, QModelIndex, QSize, Qt)
 from qtpy.QtGui import QPalette, QColor
 
 # Local imports
-from conda_manager.utils import get_icon, sort_versions
+from conda_manager.models.filter import SearchIndex
+from conda_manager.utils import get_icon
 from conda_manager.utils import constants as C
+from conda_manager.utils.store import installed_status
 
 
 _ = gettext.gettext
 
+# Columns stored in integer arrays, the rest are stored in lists
+INT_COLUMNS = (C.COL_ACTION, C.COL_STATUS)
+BOOL_COLUMNS = (C.COL_INSTALL, C.COL_REMOVE, C.COL_UPGRADE, C.COL_DOWNGRADE)
+DATA_COLUMNS = (C.COL_ACTION, C.COL_PACKAGE_TYPE, C.COL_NAME,
+                C.COL_DESCRIPTION, C.COL_VERSION, C.COL_STATUS, C.COL_URL,
+                C.COL_LICENSE, C.COL_INSTALL, C.COL_REMOVE, C.COL_UPGRADE,
+                C.COL_DOWNGRADE, C.COL_ACTION_VERSION)
+
+INSTALLED_STATUS = (C.INSTALLED, C.UPGRADABLE, C.DOWNGRADABLE,
+                    C.MIXGRADABLE)
+UPGRADABLE_STATUS = (C.UPGRADABLE, C.MIXGRADABLE)
+DOWNGRADABLE_STATUS = (C.DOWNGRADABLE, C.MIXGRADABLE)
+
+
+def rows_to_columns(rows):
+    """
+    Convert a list of row dicts keyed by `C.COL_*` to a list of columns.
+
+    Columns not stored by the model are None.
+    """
+    columns = [None] * len(C.COLUMNS)
+
+    for column in DATA_COLUMNS:
+        values = [row[column] for row in rows]
+        if column in INT_COLUMNS:
+            values = array('i', values)
+        elif column in BOOL_COLUMNS:
+            values = array('b', [bool(v) for v in values])
+        columns[column] = values
+
+    return columns
+
+
+class _RowView(object):
+    """View of a single row of the model, indexed by `C.COL_*`."""
+
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns, row):
+        """View of a single row of the model, indexed by `C.COL_*`."""
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, column):
+        """Return the value of `column` in this row."""
+        values = self._columns[column]
+        if values is None:
+            raise KeyError(column)
+        return values[self._row]
+
+    def __setitem__(self, column, value):
+        """Set the value of `column` in this row."""
+        values = self._columns[column]
+        if values is None:
+            raise KeyError(column)
+        values[self._row] = value
+
+    def get(self, column, default=None):
+        """Return the value of `column` in this row or `default`."""
+        try:
+            return self[column]
+        except KeyError:
+            return default
+
+
+class PackagesModelData(object):
+    """
+    Package store, row columns and search index of a packages model.
+
+    It holds no Qt objects, so it can be built in a worker thread and
+    handed over to `CondaPackagesModel`.
+    """
+
+    __slots__ = ('packages', 'columns', 'row_count', 'search_index')
+
+    def __init__(self, packages, rows):
+        """Package store, row columns and search index of a model."""
+        self.packages = packages
+        self.columns = rows_to_columns(rows)
+        self.row_count = len(rows)
+        self.search_index = SearchIndex(self.columns[C.COL_NAME],
+                                        self.columns[C.COL_DESCRIPTION],
+                                        self.columns[C.COL_STATUS])
+
 
 class CondaPackagesModel(QAbstractTableModel):
     """
     Abstract Model to handle the packages in a conda environment.
+
+    Rows are stored by column, one list or integer array per `C.COL_*`.
+    Views only see the first `FETCH_SIZE` rows at first, the rest are
+    added by `fetchMore` as needed.
     """
-    def __init__(self, parent, packages, data):
+    # Number of rows added to the views on every fetchMore
+    FETCH_SIZE = 500
+
+    def __init__(self, parent, model_data):
         super(CondaPackagesModel, self).__init__(parent)
         self._parent = parent
-        self._packages = packages
-        self._rows = data
-        self._name_to_index = {r[C.COL_NAME]: i for i, r in enumerate(data)}
+        self._packages = model_data.packages
+        self._columns = model_data.columns
+        self._row_count = model_data.row_count
+        self._fetched_count = min(self.FETCH_SIZE, self._row_count)
+        self._name_to_index = None
+
+        self._role_data = {
+            Qt.DisplayRole: self._display_data,
+            Qt.BackgroundRole: self._background_data,
+            Qt.TextAlignmentRole: self._alignment_data,
+            Qt.DecorationRole: self._decoration_data,
+            Qt.ToolTipRole: self._tooltip_data,
+            Qt.ForegroundRole: self._foreground_data,
+            Qt.SizeHintRole: self._size_hint_data,
+            }
+
+        # Values of the roles other than display only depend on the state
+        # of the row (see `_render_key`), so they are built once per state
+        self._render_cache = {}
 
         palette = QPalette()
         self._palette = {
@@ -64,6 +174,7 @@ class CondaPackagesModel(QAbstractTableModel):
             'background.install': QColor(0, 128, 0, 50),
             'background.upgrade': QColor(0, 0, 128, 50),
             'background.downgrade': QColor(128, 0, 128, 50),
+            'foreground.installed': palette.color(QPalette.WindowText),
             'foreground.not.installed': palette.color(QPalette.Mid),
             'foreground.upgrade': QColor(0, 0, 128, 255),
             }
@@ -73,9 +184,42 @@ class CondaPackagesModel(QAbstractTableModel):
         end = self.index(row, column)
         self.dataChanged.emit(start, end)
 
+    def _update_rows(self, rows):
+        """
+        Emit a single `dataChanged` covering all the columns of `rows`.
+
+        The range goes from the first to the last of `rows`, which is much
+        cheaper for the views than a signal per changed cell.
+        """
+        if not rows:
+            return
+
+        # Rows not fetched yet are not known by the views
+        first = min(rows)
+        last = min(max(rows), self._fetched_count - 1)
+        if first <= last:
+            start = self.index(first, 0)
+            end = self.index(last, self.columnCount() - 1)
+            self.dataChanged.emit(start, end)
+
     def update_style_palette(self, palette={}):
         if palette:
             self._palette.update(palette)
+        self._render_cache.clear()
+
+    def _render_key(self, role, row, column):
+        """Return the state of `row` that the `role` data of `column` uses."""
+        columns = self._columns
+        if column == C.COL_INSTALL:
+            pressed = (columns[C.COL_INSTALL][row], columns[C.COL_REMOVE][row])
+        elif column in BOOL_COLUMNS:
+            pressed = columns[column][row]
+        else:
+            pressed = None
+
+        return (role, column, columns[C.COL_STATUS][row],
+                columns[C.COL_ACTION][row], columns[C.COL_PACKAGE_TYPE][row],
+                pressed)
 
     def flags(self, index):
         """Override Qt method"""
@@ -93,196 +237,170 @@ class CondaPackagesModel(QAbstractTableModel):
 
     def data(self, index, role=Qt.DisplayRole):
         """Override Qt method"""
-        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+        if not index.isValid() or not 0 <= index.row() < self._row_count:
             return to_qvariant()
 
-        row = index.row()
-        column = index.column()
+        # Only the columns needed by the given role and column are read
+        role_data = self._role_data.get(role)
+        if role_data is None:
+            return to_qvariant()
+
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            return role_data(row, column)
+
+        key = self._render_key(role, row, column)
+        try:
+            return self._render_cache[key]
+        except KeyError:
+            value = self._render_cache[key] = role_data(row, column)
+            return value
+
+    def _display_data(self, row, column):
+        """Return the data of the display role."""
+        if column in (C.COL_PACKAGE_TYPE, C.COL_NAME, C.COL_VERSION,
+                      C.COL_STATUS, C.COL_DESCRIPTION, C.COL_ACTION):
+            return to_qvariant(self._columns[column][row])
+        return to_qvariant()
 
+    def _background_data(self, row, column):
+        """Return the data of the background role."""
         P = self._palette
+        action = self._columns[C.COL_ACTION][row]
+
+        if action == C.ACTION_REMOVE:
+            return to_qvariant(P['background.remove'])
+        elif action == C.ACTION_INSTALL:
+            return to_qvariant(P['background.install'])
+        elif action == C.ACTION_UPGRADE:
+            return to_qvariant(P['background.upgrade'])
+        elif action == C.ACTION_DOWNGRADE:
+            return to_qvariant(P['background.downgrade'])
+        return to_qvariant()
 
-        if self._rows[row] == row:
-            action = C.ACTION_NONE
-            type_ = u''
-            name = u''
-            description = u''
-            version = u'-'
-            status = -1
-            # url = u''
-            # license_ = u''
-            i = False
-            r = False
-            u = False
-            d = False
-            # action_version = None
-        else:
-            action = self._rows[row][C.COL_ACTION]
-            type_ = self._rows[row][C.COL_PACKAGE_TYPE]
-            name = self._rows[row][C.COL_NAME]
-            description = self._rows[row][C.COL_DESCRIPTION]
-            version = self._rows[row][C.COL_VERSION]
-            status = self._rows[row][C.COL_STATUS]
-            # url = self._rows[row][C.COL_URL]
-            # license_ = self._rows[row][C.COL_LICENSE]
-            i = self._rows[row][C.COL_INSTALL]
-            r = self._rows[row][C.COL_REMOVE]
-            u = self._rows[row][C.COL_UPGRADE]
-            d = self._rows[row][C.COL_DOWNGRADE]
-            # action_version = self._rows[row][C.COL_ACTION_VERSION]
-
-        is_upgradable = self.is_upgradable(self.index(row, C.COL_VERSION))
-#        if is_upgradable:
-#            version += C.UPGRADE_SYMBOL
+    def _alignment_data(self, row, column):
+        """Return the data of the text alignment role."""
+        if column in (C.COL_NAME, C.COL_DESCRIPTION):
+            return to_qvariant(int(Qt.AlignLeft | Qt.AlignVCenter))
+        elif column == C.COL_VERSION and self._is_upgradable(row):
+            return to_qvariant(int(Qt.AlignLeft | Qt.AlignVCenter))
+        return to_qvariant()
 
-        if role == Qt.DisplayRole:
-            if column == C.COL_PACKAGE_TYPE:
-                return to_qvariant(type_)
-            if column == C.COL_NAME:
-                return to_qvariant(name)
-            elif column == C.COL_VERSION:
-                return to_qvariant(version)
-            elif column == C.COL_STATUS:
-                return to_qvariant(status)
-            elif column == C.COL_DESCRIPTION:
-                return to_qvariant(description)
-            elif column == C.COL_ACTION:
-                return to_qvariant(action)
-        elif role == Qt.BackgroundRole:
-            if action == C.ACTION_REMOVE:
-                return to_qvariant(P['background.remove'])
+    def _decoration_data(self, row, column):
+        """Return the data of the decoration role."""
+        P = self._palette
+        columns = self._columns
+
+        if column == C.COL_ACTION:
+            action = columns[C.COL_ACTION][row]
+            status = columns[C.COL_STATUS][row]
+            if action == C.ACTION_NONE:
+                if status == C.NOT_INSTALLED:
+                    return to_qvariant(P['icon.action.not_installed'])
+                elif status in INSTALLED_STATUS:
+                    return to_qvariant(P['icon.action.installed'])
             elif action == C.ACTION_INSTALL:
-                return to_qvariant(P['background.install'])
+                return to_qvariant(P['icon.action.add'])
+            elif action == C.ACTION_REMOVE:
+                return to_qvariant(P['icon.action.remove'])
             elif action == C.ACTION_UPGRADE:
-                return to_qvariant(P['background.upgrade'])
+                return to_qvariant(P['icon.action.upgrade'])
             elif action == C.ACTION_DOWNGRADE:
-                return to_qvariant(P['background.downgrade'])
-        elif role == Qt.TextAlignmentRole:
-            if column in [C.COL_NAME, C.COL_DESCRIPTION]:
-                return to_qvariant(int(Qt.AlignLeft | Qt.AlignVCenter))
-            elif column in [C.COL_VERSION] and is_upgradable:
-                return to_qvariant(int(Qt.AlignLeft | Qt.AlignVCenter))
-            # else:
-            #     return to_qvariant(int(Qt.AlignHCenter | Qt.AlignVCenter))
-        elif role == Qt.DecorationRole:
-            if column == C.COL_ACTION:
-                if action == C.ACTION_NONE:
-                    if status == C.NOT_INSTALLED:
-                        return to_qvariant(P['icon.action.not_installed'])
-                    elif status in [C.UPGRADABLE, C.MIXGRADABLE]:
-                        return to_qvariant(P['icon.action.installed'])
-                    elif status in [C.INSTALLED, C.DOWNGRADABLE,
-                                    C.MIXGRADABLE]:
-                        return to_qvariant(P['icon.action.installed'])
-                elif action == C.ACTION_INSTALL:
-                    return to_qvariant(P['icon.action.add'])
-                elif action == C.ACTION_REMOVE:
-                    return to_qvariant(P['icon.action.remove'])
-                elif action == C.ACTION_UPGRADE:
-                    return to_qvariant(P['icon.action.upgrade'])
-                elif action == C.ACTION_DOWNGRADE:
-                    return to_qvariant(P['icon.action.downgrade'])
-                else:
-                    return to_qvariant()
-            elif column == C.COL_PACKAGE_TYPE:
-                if type_ == C.CONDA_PACKAGE:
-                    return to_qvariant(P['icon.anaconda'])
-                elif type_ == C.PIP_PACKAGE:
-                    return to_qvariant(P['icon.python'])
+                return to_qvariant(P['icon.action.downgrade'])
+        elif column == C.COL_PACKAGE_TYPE:
+            type_ = columns[C.COL_PACKAGE_TYPE][row]
+            if type_ == C.CONDA_PACKAGE:
+                return to_qvariant(P['icon.anaconda'])
+            elif type_ == C.PIP_PACKAGE:
+                return to_qvariant(P['icon.python'])
+        elif column == C.COL_INSTALL:
+            status = columns[C.COL_STATUS][row]
+            if status == C.NOT_INSTALLED:
+                if columns[C.COL_INSTALL][row]:
+                    return to_qvariant(P['icon.add.pressed'])
                 else:
-                    return to_qvariant()
-            elif column == C.COL_INSTALL:
-                if status == C.NOT_INSTALLED:
-                    if i:
-                        return to_qvariant(P['icon.add.pressed'])
-                    else:
-                        return to_qvariant(P['icon.add.active'])
-                elif (status == C.INSTALLED or
-                      status == C.UPGRADABLE or
-                      status == C.DOWNGRADABLE or
-                      status == C.MIXGRADABLE):
-                    if r:
-                        return to_qvariant(P['icon.remove.pressed'])
-                    else:
-                        return to_qvariant(P['icon.remove.active'])
-                else:
-                    return to_qvariant(P['icon.add.inactive'])
-            elif column == C.COL_REMOVE:
-                if (status == C.INSTALLED or
-                    status == C.UPGRADABLE or
-                    status == C.DOWNGRADABLE or
-                   status == C.MIXGRADABLE):
-                    if r:
-                        return to_qvariant(P['icon.remove.pressed'])
-                    else:
-                        return to_qvariant(P['icon.remove.active'])
+                    return to_qvariant(P['icon.add.active'])
+            elif status in INSTALLED_STATUS:
+                if columns[C.COL_REMOVE][row]:
+                    return to_qvariant(P['icon.remove.pressed'])
                 else:
-                    return to_qvariant(P['icon.remove.inactive'])
-            elif column == C.COL_UPGRADE:
-                if status == C.UPGRADABLE or \
-                  status == C.MIXGRADABLE:
-                    if u:
-                        return to_qvariant(P['icon.upgrade.pressed'])
-                    else:
-                        return to_qvariant(P['icon.upgrade.active'])
+                    return to_qvariant(P['icon.remove.active'])
+            else:
+                return to_qvariant(P['icon.add.inactive'])
+        elif column == C.COL_REMOVE:
+            if columns[C.COL_STATUS][row] in INSTALLED_STATUS:
+                if columns[C.COL_REMOVE][row]:
+                    return to_qvariant(P['icon.remove.pressed'])
                 else:
-                    return to_qvariant(P['icon.upgrade.inactive'])
-            elif column == C.COL_DOWNGRADE:
-                if status == C.DOWNGRADABLE or \
-                  status == C.MIXGRADABLE:
-                    if d:
-                        return to_qvariant(P['icon.downgrade.pressed'])
-                    else:
-                        return to_qvariant(P['icon.downgrade.active'])
+                    return to_qvariant(P['icon.remove.active'])
+            else:
+                return to_qvariant(P['icon.remove.inactive'])
+        elif column == C.COL_UPGRADE:
+            if columns[C.COL_STATUS][row] in UPGRADABLE_STATUS:
+                if columns[C.COL_UPGRADE][row]:
+                    return to_qvariant(P['icon.upgrade.pressed'])
                 else:
-                    return to_qvariant(P['icon.downgrade.inactive'])
-            elif column == C.COL_VERSION:
-                if is_upgradable:
-                    return to_qvariant(P['icon.upgrade.arrow'])
+                    return to_qvariant(P['icon.upgrade.active'])
+            else:
+                return to_qvariant(P['icon.upgrade.inactive'])
+        elif column == C.COL_DOWNGRADE:
+            if columns[C.COL_STATUS][row] in DOWNGRADABLE_STATUS:
+                if columns[C.COL_DOWNGRADE][row]:
+                    return to_qvariant(P['icon.downgrade.pressed'])
                 else:
-                    return to_qvariant(P['spacer'])
-        elif role == Qt.ToolTipRole:
-            if column == C.COL_INSTALL and status == C.NOT_INSTALLED:
-                return to_qvariant(_('Install package'))
-            elif column == C.COL_INSTALL and (status == C.INSTALLED or
-                                              status == C.UPGRADABLE or
-                                              status == C.DOWNGRADABLE or
-                                              status == C.MIXGRADABLE):
-                return to_qvariant(_('Remove package'))
-            elif column == C.COL_UPGRADE and (status == C.INSTALLED or
-                                              status == C.UPGRADABLE or
-                                              status == C.MIXGRADABLE):
-                return to_qvariant(_('Upgrade package'))
-            elif column == C.COL_DOWNGRADE and (status == C.INSTALLED or
-                                                status == C.DOWNGRADABLE or
-                                                status == C.MIXGRADABLE):
-                return to_qvariant(_('Downgrade package'))
-            elif column == C.COL_PACKAGE_TYPE:
-                if type_ == C.CONDA_PACKAGE:
-                    return to_qvariant(_('Conda package'))
-                elif type_ == C.PIP_PACKAGE:
-                    return to_qvariant(_('Python package'))
-            elif column == C.COL_VERSION:
-                if is_upgradable:
-                    return to_qvariant(_('Update available'))
-        elif role == Qt.ForegroundRole:
-            palette = QPalette()
-            if column in [C.COL_NAME, C.COL_DESCRIPTION]:
-                if status in [C.INSTALLED, C.UPGRADABLE, C.DOWNGRADABLE,
-                              C.MIXGRADABLE]:
-                    color = palette.color(QPalette.WindowText)
-                    return to_qvariant(color)
-                elif status in [C.NOT_INSTALLED]:
-                    color = palette.color(QPalette.Mid)
-                    color = P['foreground.not.installed']
-                    return to_qvariant(color)
-            elif column in [C.COL_VERSION]:
-                if is_upgradable:
-                    return to_qvariant(P['foreground.upgrade'])
-
-        elif role == Qt.SizeHintRole:
-            if column in [C.ACTION_COLUMNS] + [C.COL_PACKAGE_TYPE]:
-                return to_qvariant(QSize(24, 24))
+                    return to_qvariant(P['icon.downgrade.active'])
+            else:
+                return to_qvariant(P['icon.downgrade.inactive'])
+        elif column == C.COL_VERSION:
+            if self._is_upgradable(row):
+                return to_qvariant(P['icon.upgrade.arrow'])
+            else:
+                return to_qvariant(P['spacer'])
+        return to_qvariant()
 
+    def _tooltip_data(self, row, column):
+        """Return the data of the tooltip role."""
+        if column == C.COL_PACKAGE_TYPE:
+            type_ = self._columns[C.COL_PACKAGE_TYPE][row]
+            if type_ == C.CONDA_PACKAGE:
+                return to_qvariant(_('Conda package'))
+            elif type_ == C.PIP_PACKAGE:
+                return to_qvariant(_('Python package'))
+            return to_qvariant()
+
+        status = self._columns[C.COL_STATUS][row]
+        if column == C.COL_INSTALL and status == C.NOT_INSTALLED:
+            return to_qvariant(_('Install package'))
+        elif column == C.COL_INSTALL and status in INSTALLED_STATUS:
+            return to_qvariant(_('Remove package'))
+        elif column == C.COL_UPGRADE and (status == C.INSTALLED or
+                                          status in UPGRADABLE_STATUS):
+            return to_qvariant(_('Upgrade package'))
+        elif column == C.COL_DOWNGRADE and (status == C.INSTALLED or
+                                            status in DOWNGRADABLE_STATUS):
+            return to_qvariant(_('Downgrade package'))
+        elif column == C.COL_VERSION and status in UPGRADABLE_STATUS:
+            return to_qvariant(_('Update available'))
+        return to_qvariant()
+
+    def _foreground_data(self, row, column):
+        """Return the data of the foreground role."""
+        if column in (C.COL_NAME, C.COL_DESCRIPTION):
+            status = self._columns[C.COL_STATUS][row]
+            if status in INSTALLED_STATUS:
+                color = self._palette['foreground.installed']
+                return to_qvariant(color)
+            elif status == C.NOT_INSTALLED:
+                color = self._palette['foreground.not.installed']
+                return to_qvariant(color)
+        elif column == C.COL_VERSION and self._is_upgradable(row):
+            return to_qvariant(self._palette['foreground.upgrade'])
+        return to_qvariant()
+
+    def _size_hint_data(self, row, column):
+        """Return the data of the size hint role."""
+        if column == C.COL_PACKAGE_TYPE:
+            return to_qvariant(QSize(24, 24))
         return to_qvariant()
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -308,15 +426,34 @@ class CondaPackagesModel(QAbstractTableModel):
 
     def rowCount(self, index=QModelIndex()):
         """Override Qt method"""
-        return len(self._rows)
+        return self._fetched_count
+
+    def canFetchMore(self, index=QModelIndex()):
+        """Override Qt method"""
+        return not index.isValid() and self._fetched_count < self._row_count
+
+    def fetchMore(self, index=QModelIndex()):
+        """Override Qt method"""
+        if not self.canFetchMore(index):
+            return
+
+        first = self._fetched_count
+        count = min(self.FETCH_SIZE, self._row_count - first)
+        self.beginInsertRows(QModelIndex(), first, first + count - 1)
+        self._fetched_count += count
+        self.endInsertRows()
 
     def columnCount(self, index=QModelIndex()):
         """Override Qt method"""
         return len(C.COLUMNS)
 
+    def column(self, column):
+        """Return the values of `column` for all the rows."""
+        return self._columns[column]
+
     def row(self, rownum):
-        """ """
-        return self._rows[rownum]
+        """Return a view of row `rownum` indexed by `C.COL_*`."""
+        return _RowView(self._columns, rownum)
 
     def first_index(self):
         """ """
@@ -329,61 +466,157 @@ class CondaPackagesModel(QAbstractTableModel):
     def update_row_icon(self, row, column):
         """ """
         if column in C.ACTION_COLUMNS:
-            r = self._rows[row]
-            actual_state = r[column]
-            r[column] = not actual_state
-            self._rows[row] = r
+            values = self._columns[column]
+            values[row] = not values[row]
             self._update_cell(row, column)
 
+    def _is_upgradable(self, row):
+        """Return True if the package in `row` can be upgraded."""
+        return self._columns[C.COL_STATUS][row] in UPGRADABLE_STATUS
+
     def is_installable(self, model_index):
         """ """
         row = model_index.row()
-        status = self._rows[row][C.COL_STATUS]
+        status = self._columns[C.COL_STATUS][row]
         return status == C.NOT_INSTALLED
 
     def is_removable(self, model_index):
         """ """
         row = model_index.row()
-        status = self._rows[row][C.COL_STATUS]
-        return status in [C.UPGRADABLE, C.DOWNGRADABLE, C.INSTALLED,
-                          C.MIXGRADABLE]
+        status = self._columns[C.COL_STATUS][row]
+        return status in INSTALLED_STATUS
 
     def is_upgradable(self, model_index):
         """ """
-        row = model_index.row()
-        status = self._rows[row][C.COL_STATUS]
-        return status == C.UPGRADABLE or \
-            status == C.MIXGRADABLE
+        return self._is_upgradable(model_index.row())
 
     def is_downgradable(self, model_index):
         """ """
         row = model_index.row()
-        status = self._rows[row][C.COL_STATUS]
-        return status == C.DOWNGRADABLE or \
-            status == C.MIXGRADABLE
+        status = self._columns[C.COL_STATUS][row]
+        return status in DOWNGRADABLE_STATUS
 
     def action_status(self, model_index):
         """ """
         row = model_index.row()
-        action_status = self._rows[row][C.COL_ACTION]
+        action_status = self._columns[C.COL_ACTION][row]
         return action_status
 
     def set_action_status(self, model_index, status, version=None):
         """
         """
         row = model_index.row()
-        self._rows[row][C.COL_ACTION] = status
-        self._rows[row][C.COL_ACTION_VERSION] = version
-        self._update_cell(row, model_index.column())
+        self._columns[C.COL_ACTION][row] = status
+        self._columns[C.COL_ACTION_VERSION][row] = version
+        self._update_rows([row])
+
+    def set_actions(self, actions):
+        """
+        Set the actions of several rows at once.
+
+        actions : dict
+            Maps rows to `(action, version)` tuples.
+        """
+        action_values = self._columns[C.COL_ACTION]
+        action_versions = self._columns[C.COL_ACTION_VERSION]
+        for row, (action, version) in actions.items():
+            action_values[row] = action
+            action_versions[row] = version
+        self._update_rows(actions)
 
     def clear_actions(self):
+        """Remove the actions of all the rows."""
+        actions = self._columns[C.COL_ACTION]
+        rows = [i for i, action in enumerate(actions)
+                if action != C.ACTION_NONE]
+        self.set_actions(dict((row, (C.ACTION_NONE, None)) for row in rows))
+
+    def update_statuses(self, statuses, versions=None):
         """
+        Update the status (and version) of several rows at once.
+
+        statuses : dict
+            Maps rows to `C.PACKAGE_STATUS` values.
+        versions : dict
+            Maps rows to the version displayed.
+
+        Return the list of rows whose status changed.
         """
-        for i, row in enumerate(self._rows):
-            self._rows[i][C.COL_ACTION] = C.ACTION_NONE
-            self._rows[i][C.COL_ACTION_VERSION] = None
-            self._update_cell(i, C.COL_ACTION)
-            self._update_cell(i, C.COL_ACTION_VERSION)
+        status_values = self._columns[C.COL_STATUS]
+        version_values = self._columns[C.COL_VERSION]
+        versions = versions or {}
+
+        changed = [row for row, status in statuses.items()
+                   if status_values[row] != status]
+        for row, status in statuses.items():
+            status_values[row] = status
+        for row, version in versions.items():
+            version_values[row] = version
+        self._update_rows(set(statuses) | set(versions))
+        return changed
+
+    def linked_changes(self, snapshot, pip=None):
+        """
+        Return the status and version changes of the package rows.
+
+        snapshot : EnvironmentSnapshot
+            Packages currently linked in the environment.
+        pip : list of str
+            Canonical names of the pip packages currently installed. If
+            None, the pip package rows are not checked.
+
+        Return the `(statuses, versions)` tuple of dicts mapping the rows
+        that differ to their new status and version. Conda packages not in
+        the model are ignored. Return None if pip packages were installed or
+        removed, the rows must then be built again.
+        """
+        columns = self._columns
+        status_values = columns[C.COL_STATUS]
+        version_values = columns[C.COL_VERSION]
+        statuses = {}
+        versions = {}
+
+        pip_versions = {}
+        for canonical_name in pip or ():
+            name, version, build = canonical_name.rsplit('-', 2)
+            pip_versions[name] = version
+
+        if pip is not None:
+            pip_names = set(name for name, type_ in
+                            zip(columns[C.COL_NAME],
+                                columns[C.COL_PACKAGE_TYPE])
+                            if type_ == C.PIP_PACKAGE)
+            if pip_names != set(pip_versions):
+                return None
+
+        for row, type_ in enumerate(columns[C.COL_PACKAGE_TYPE]):
+            name = columns[C.COL_NAME][row]
+            if type_ == C.PIP_PACKAGE:
+                version = pip_versions.get(name)
+                if version is not None and version != version_values[row]:
+                    statuses[row] = status_values[row]
+                    versions[row] = version
+                continue
+
+            record = self._packages.get(name)
+            available = record.versions if record is not None else ()
+            version = snapshot.package_version(name)
+
+            if version is not None:
+                status = installed_status(version, available)
+            else:
+                status = C.NOT_INSTALLED
+                version = ''
+                if record is not None:
+                    version = record.latest_version or ''
+                if not version and available:
+                    version = available[-1]
+
+            if status != status_values[row] or version != version_values[row]:
+                statuses[row] = status
+                versions[row] = version
+
+        return statuses, versions
 
     def get_actions(self):
         """
@@ -397,22 +630,23 @@ class CondaPackagesModel(QAbstractTableModel):
                                }
                }
 
-        for i, row in enumerate(self._rows):
-            action = self._rows[i][C.COL_ACTION]
-            name = self._rows[i][C.COL_NAME]
-            type_ = self._rows[i][C.COL_PACKAGE_TYPE]
-            action_version = self._rows[i][C.COL_ACTION_VERSION]
-            current_version = self.get_package_version(name)
-
+        columns = self._columns
+        for i, action in enumerate(columns[C.COL_ACTION]):
             if action != C.ACTION_NONE:
-                version_from = current_version
-                version_to = action_version
+                name = columns[C.COL_NAME][i]
+                type_ = columns[C.COL_PACKAGE_TYPE][i]
+                version_from = self.get_package_version(name)
+                version_to = columns[C.COL_ACTION_VERSION][i]
                 dic[type_][action].append({'name': name,
                                            'version_from': version_from,
                                            'version_to': version_to,
                                            })
         return dic
 
+    def package_store(self):
+        """Return the `PackageStore` the rows were built from."""
+        return self._packages
+
     def get_package_versions(self, name):
         """
         Gives all the compatible package canonical name
@@ -420,19 +654,18 @@ class CondaPackagesModel(QAbstractTableModel):
         name : str
             Name of the package
         """
-        package_data = self._packages.get(name)
-        versions = []
-
-        if package_data:
-            versions = sort_versions(list(package_data.get('versions', [])))
-
-        return versions
+        # Versions in the package store are already sorted
+        return self._packages.versions(name)
 
     def get_package_version(self, name):
         """  """
+        if self._name_to_index is None:
+            self._name_to_index = dict(
+                (n, i) for i, n in enumerate(self._columns[C.COL_NAME]))
+
         if name in self._name_to_index:
             index = self._name_to_index[name]
-            version = self.row(index)[C.COL_VERSION]
+            version = self._columns[C.COL_VERSION][index]
             return version.replace(C.UPGRADE_SYMBOL, '')
         else:
             return u''
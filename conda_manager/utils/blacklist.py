@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Package names excluded from the packages view.
+
+Entries are plain names, glob patterns (e.g. `qt*`) or regular expressions
+prefixed by `re:` (e.g. `re:^_.*`). Names and patterns are case insensitive
+and patterns must match the whole package name.
+"""
+
+# Standard library imports
+import fnmatch
+import re
+
+# Prefix of the regular expression entries
+REGEX_PREFIX = 're:'
+
+# Characters that make an entry a glob pattern
+GLOB_CHARS = '*?['
+
+
+class PackageBlacklist(object):
+    """
+    Set of package names and patterns excluded from the packages view.
+
+    Plain names are checked with a set lookup and all the patterns are
+    compiled once into a single regular expression.
+    """
+
+    def __init__(self, entries=()):
+        """Set of package names and patterns excluded from the view."""
+        names = set()
+        patterns = []
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+
+            if entry.startswith(REGEX_PREFIX):
+                patterns.append(entry[len(REGEX_PREFIX):])
+            elif any(char in entry for char in GLOB_CHARS):
+                patterns.append(fnmatch.translate(entry.lower()))
+            else:
+                names.add(entry.lower())
+
+        self._entries = tuple(entries)
+        self._names = frozenset(names)
+        self._pattern = None
+        if patterns:
+            pattern = '|'.join(r'(?:{0})\Z'.format(p) for p in patterns)
+            self._pattern = re.compile(pattern, re.IGNORECASE)
+
+    def __contains__(self, name):
+        """Return True if package `name` is blacklisted."""
+        if name.lower() in self._names:
+            return True
+        return self._pattern is not None and bool(self._pattern.match(name))
+
+    def __iter__(self):
+        """Iterate over the entries of the blacklist."""
+        return iter(self._entries)
+
+    def __len__(self):
+        """Return the number of entries of the blacklist."""
+        return len(self._entries)
+
+    def __repr__(self):
+        """Return the representation of the blacklist."""
+        return 'PackageBlacklist({0!r})'.format(list(self._entries))
+
+    def filter_names(self, names):
+        """Return the set of `names` that are blacklisted."""
+        return set(name for name in names if name in self)
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Snapshots of the packages linked in conda environments and registry of the
+environments.
+
+The `conda-meta` folder of an environment is only read again when its
+modification time or the one of its `history` file change. Packages are
+indexed by name, so linked and version lookups are dict hits. Likewise the
+envs directories are only scanned again when they change.
+"""
+
+# Standard library imports
+import os
+import threading
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Local imports
+from conda_manager.utils.misc import get_mtime
+
+
+CONDA_META = 'conda-meta'
+HISTORY = 'history'
+META_SUFFIX = '.json'
+
+
+def _meta_filenames(meta_dir):
+    """Return the metadata file names of `meta_dir`."""
+    if scandir is not None:
+        return [entry.name for entry in scandir(meta_dir)
+                if entry.name.endswith(META_SUFFIX)]
+    return [fn for fn in os.listdir(meta_dir) if fn.endswith(META_SUFFIX)]
+
+
+class EnvironmentSnapshot(object):
+    """Packages linked in an environment at a given time."""
+
+    __slots__ = ('prefix', 'key', 'linked', 'packages')
+
+    def __init__(self, prefix, key, linked):
+        """Packages linked in an environment at a given time."""
+        self.prefix = prefix
+        self.key = key
+        # Canonical names, `name-version-build`
+        self.linked = frozenset(linked)
+        # {name: (version, build)}
+        self.packages = {}
+        for canonical_name in self.linked:
+            parts = canonical_name.rsplit('-', 2)
+            if len(parts) == 3:
+                name, version, build = parts
+                self.packages[name] = (version, build)
+
+    def __contains__(self, name):
+        """Return True if a package `name` is linked."""
+        return name in self.packages
+
+    def names(self):
+        """Return the names of the linked packages."""
+        return self.packages.keys()
+
+    def package_version(self, name, build=False):
+        """
+        Return the version of package `name` or None if not linked.
+
+        If `build` is True, the build string is appended as `version=build`.
+        """
+        package = self.packages.get(name)
+        if package is None:
+            return None
+        version, build_string = package
+        if build:
+            return '{0}={1}'.format(version, build_string)
+        return version
+
+
+_EMPTY_SNAPSHOT = EnvironmentSnapshot(None, None, ())
+
+
+class EnvironmentSnapshots(object):
+    """
+    Cache of `EnvironmentSnapshot` by prefix.
+
+    A snapshot is valid while the modification times of the `conda-meta`
+    folder and of its `history` file do not change. Conda rewrites the
+    history on every transaction, and adding or removing metadata files
+    changes the folder time.
+    """
+
+    def __init__(self):
+        """Cache of `EnvironmentSnapshot` by prefix."""
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(meta_dir):
+        """Return the validity key of the snapshot of `meta_dir`."""
+        return (get_mtime(meta_dir),
+                get_mtime(os.path.join(meta_dir, HISTORY)))
+
+    def get(self, prefix):
+        """
+        Return the snapshot of the environment in `prefix`.
+
+        Environments without a `conda-meta` folder have an empty snapshot.
+        """
+        if not prefix:
+            return _EMPTY_SNAPSHOT
+
+        meta_dir = os.path.join(prefix, CONDA_META)
+        key = self._key(meta_dir)
+        if key[0] is None:
+            with self._lock:
+                self._snapshots.pop(prefix, None)
+            return _EMPTY_SNAPSHOT
+
+        with self._lock:
+            snapshot = self._snapshots.get(prefix)
+        if snapshot is not None and snapshot.key == key:
+            return snapshot
+
+        try:
+            filenames = _meta_filenames(meta_dir)
+        except OSError:
+            return _EMPTY_SNAPSHOT
+
+        linked = [fn[:-len(META_SUFFIX)] for fn in filenames]
+        snapshot = EnvironmentSnapshot(prefix, key, linked)
+        with self._lock:
+            self._snapshots[prefix] = snapshot
+        return snapshot
+
+    def invalidate(self, prefix=None):
+        """Drop the snapshot of `prefix`, or all of them if None."""
+        with self._lock:
+            if prefix is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(prefix, None)
+
+    def linked(self, prefix):
+        """Return the frozenset of canonical names linked in `prefix`."""
+        return self.get(prefix).linked
+
+    def package_version(self, prefix, name, build=False):
+        """Return the version of package `name` in `prefix` or None."""
+        return self.get(prefix).package_version(name, build=build)
+
+
+ENVIRONMENTS_TXT = os.path.join(os.path.expanduser('~'), '.conda',
+                                'environments.txt')
+
+
+def _is_environment(prefix):
+    """Return True if `prefix` is a conda environment."""
+    return os.path.isdir(os.path.join(prefix, CONDA_META))
+
+
+class EnvironmentRegistry(object):
+    """
+    Registry of the conda environments and their names.
+
+    Environments are found in every envs directory and in the
+    `~/.conda/environments.txt` file. The scan is only done again when the
+    modification time of one of those changes, or when a folder of an envs
+    directory that was not an environment yet gets its `conda-meta`.
+    """
+
+    def __init__(self, environments_txt=ENVIRONMENTS_TXT):
+        """Registry of the conda environments and their names."""
+        self._environments_txt = environments_txt
+        self._key = None
+        self._prefixes = []
+        self._names = {}
+        # Folders of the envs directories without `conda-meta` at scan time
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def _scan_key(self, root_prefix, envs_dirs):
+        """Return the validity key of a scan."""
+        paths = list(envs_dirs) + [self._environments_txt]
+        return (root_prefix, tuple(envs_dirs),
+                tuple(get_mtime(path) for path in paths))
+
+    def _read_environments_txt(self):
+        """Return the prefixes listed in `environments.txt`."""
+        try:
+            with open(self._environments_txt) as f:
+                return [line.strip() for line in f if line.strip()]
+        except (IOError, OSError):
+            return []
+
+    def _scan(self, root_prefix, envs_dirs):
+        """Find the environments and build the name to prefix map."""
+        prefixes = []
+        names = {}
+        known = set()
+        pending = []
+
+        for envs_dir in envs_dirs:
+            try:
+                entries = sorted(os.listdir(envs_dir))
+            except OSError:
+                continue
+
+            for entry in entries:
+                prefix = os.path.join(envs_dir, entry)
+                normalized = os.path.normpath(prefix)
+                if normalized in known:
+                    continue
+                if not _is_environment(prefix):
+                    # Maybe an environment being created
+                    if os.path.isdir(prefix):
+                        pending.append(prefix)
+                    continue
+                known.add(normalized)
+                prefixes.append(prefix)
+                # The first envs directory takes precedence, like in conda
+                names.setdefault(entry, prefix)
+
+        root = os.path.normpath(root_prefix) if root_prefix else None
+        for prefix in self._read_environments_txt():
+            normalized = os.path.normpath(prefix)
+            if (normalized == root or normalized in known or
+                    not _is_environment(prefix)):
+                continue
+            known.add(normalized)
+            prefixes.append(prefix)
+            names.setdefault(os.path.basename(normalized), prefix)
+
+        if root_prefix:
+            names['root'] = root_prefix
+
+        return prefixes, names, pending
+
+    def _update(self, root_prefix, envs_dirs):
+        """Scan again if the envs directories changed."""
+        key = self._scan_key(root_prefix, envs_dirs)
+        with self._lock:
+            # Creating `conda-meta` does not change the envs directory
+            created = any(_is_environment(p) for p in self._pending)
+            if key != self._key or created:
+                self._prefixes, self._names, self._pending = self._scan(
+                    root_prefix, envs_dirs)
+                self._key = key
+
+    def invalidate(self):
+        """Force a scan on the next lookup."""
+        with self._lock:
+            self._key = None
+
+    def prefixes(self, root_prefix, envs_dirs):
+        """Return the prefixes of the environments, except the root one."""
+        self._update(root_prefix, envs_dirs)
+        return list(self._prefixes)
+
+    def prefix(self, name, root_prefix, envs_dirs):
+        """Return the prefix of the environment `name` or None."""
+        self._update(root_prefix, envs_dirs)
+        return self._names.get(name)
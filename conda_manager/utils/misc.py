@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+# Standard library imports
+import os
+
 def human_bytes(n):
     """
     Return the number of bytes n in more human readable form.
@@ -21,3 +24,23 @@ def split_canonical_name(cname):
     Split a canonical package name into (name, version, build) strings.
     """
     return tuple(cname.rsplit('-', 2))
+
+
+def get_mtime(path):
+    """
+    Return the modification time of `path` or None if it is missing.
+    """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def replace_file(src, dst):
+    """
+    Rename file `src` to `dst`, replacing `dst` if it exists.
+    """
+    # os.rename does not overwrite existing files on Windows
+    if os.name == 'nt' and os.path.isfile(dst):
+        os.remove(dst)
+    os.rename(src, dst)
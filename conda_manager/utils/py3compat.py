@@ -65,6 +65,7 @@ if PY2:
     from UserDict import DictMixin as MutableMapping
     import thread as _thread
     import repr as reprlib
+    from urlparse import urlparse
 else:
     # Python 3
     import builtins                         # analysis:ignore
@@ -78,6 +79,7 @@ else:
     import pickle                           # analysis:ignore
     from collections import MutableMapping  # analysis:ignore
     import _thread                          # analysis:ignore
+    from urllib.parse import urlparse       # analysis:ignore
     import reprlib                          # analysis:ignore
 
 
@@ -244,6 +246,7 @@ if PY2:
     import string
     str_lower = string.lower
     from itertools import izip_longest as zip_longest
+    intern = intern
 else:
     # Python 3
     input = input
@@ -253,6 +256,7 @@ else:
         return (a > b) - (a < b)
     str_lower = str.lower
     from itertools import zip_longest  # analysis:ignore
+    from sys import intern  # analysis:ignore
 
 
 def qbytearray_to_str(qba):
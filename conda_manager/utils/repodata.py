@@ -0,0 +1,730 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""Helpers for handling downloaded repodata files."""
+
+# Standard library imports
+import atexit
+import bz2
+import codecs
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+
+# Local imports
+from conda_manager.utils import sort_versions
+from conda_manager.utils.logs import logger
+from conda_manager.utils.misc import replace_file
+from conda_manager.utils.py3compat import pickle
+from conda_manager.utils.store import (intern_string, PackageRecord,
+                                       PackageStore)
+
+# Suffix of the file storing the http cache headers of a repodata file
+CACHE_SUFFIX = '.cache'
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+# Size of the chunks read from repodata files while parsing them
+CHUNK_SIZE = 256 * 1024
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+# Binary index cache of the reduced repodata. The version must be increased
+# whenever the layout of the cached data changes.
+INDEX_MAGIC = b'CMRI'
+INDEX_VERSION = 2
+INDEX_FILENAME = 'repodata.index'
+
+# Suffix of the file storing the per file partials of an index cache
+PARTIALS_SUFFIX = '.partials'
+
+# Files are only reduced in the process pool if their total size is at least
+# this, smaller loads are faster in the current process
+PARALLEL_MIN_SIZE = 8 * 1024 * 1024
+
+# Process pool shared by the loads, see `_get_pool`
+_POOL = None
+_POOL_PROCESSES = None
+_POOL_LOCK = threading.Lock()
+
+
+def cache_headers_path(path):
+    """Return the path of the http cache headers file for repodata `path`."""
+    return path + CACHE_SUFFIX
+
+
+def load_cache_headers(path):
+    """Load the stored http cache headers for repodata `path`."""
+    cache_path = cache_headers_path(path)
+
+    if not (os.path.isfile(path) and os.path.isfile(cache_path)):
+        return {}
+
+    try:
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    except Exception as error:
+        logger.error(str(error))
+        return {}
+
+
+def save_cache_headers(path, url, headers):
+    """Store the http cache headers of the response for `url` in `path`."""
+    data = {'url': url,
+            'etag': headers.get('ETag'),
+            'mod': headers.get('Last-Modified'),
+            'cache_control': headers.get('Cache-Control'),
+            'fetched': time.time(),
+            }
+
+    try:
+        with open(cache_headers_path(path), 'w') as f:
+            json.dump(data, f)
+    except Exception as error:
+        logger.error(str(error))
+
+
+def touch_cache_headers(path, url, headers):
+    """Update the fetch time of `path` after a `304 Not Modified` reply."""
+    data = load_cache_headers(path)
+
+    # A 304 reply might update the headers, but does not need to include them
+    for key, header in [('etag', 'ETag'), ('mod', 'Last-Modified'),
+                        ('cache_control', 'Cache-Control')]:
+        value = headers.get(header)
+        if value:
+            data[key] = value
+
+    save_cache_headers(path, url, {'ETag': data.get('etag'),
+                                   'Last-Modified': data.get('mod'),
+                                   'Cache-Control': data.get('cache_control')})
+
+
+def clear_cache_headers(path):
+    """Remove the stored http cache headers for repodata `path`."""
+    cache_path = cache_headers_path(path)
+    if os.path.isfile(cache_path):
+        os.remove(cache_path)
+
+
+def conditional_headers(path, url):
+    """Return the request headers for a conditional get of `url` to `path`."""
+    data = load_cache_headers(path)
+    headers = {}
+
+    # Cached headers are only valid for the url they were stored for
+    if data.get('url') != url:
+        return headers
+
+    if data.get('etag'):
+        headers['If-None-Match'] = data['etag']
+
+    if data.get('mod'):
+        headers['If-Modified-Since'] = data['mod']
+
+    return headers
+
+
+def is_cache_fresh(path, url, ttl=None):
+    """
+    Check if repodata `path` for `url` can be used without a network request.
+
+    If `ttl` (in seconds) is None, the `max-age` of the `Cache-Control` header
+    sent by the server is used instead.
+    """
+    data = load_cache_headers(path)
+
+    if data.get('url') != url or not data.get('fetched'):
+        return False
+
+    if ttl is None:
+        match = MAX_AGE_RE.search(data.get('cache_control') or '')
+        ttl = int(match.group(1)) if match else 0
+
+    return time.time() - data['fetched'] < ttl
+
+
+# --- Streaming repodata parsing
+# -----------------------------------------------------------------------------
+class _JSONStream(object):
+    """
+    Incremental JSON tokenizer over a (possibly bz2 compressed) file.
+
+    Only the part of the file that has not been consumed yet is kept in
+    memory, so single values can be decoded without reading the whole file.
+    """
+
+    def __init__(self, f, compressed=False, chunk_size=CHUNK_SIZE):
+        """Incremental JSON tokenizer over a (possibly compressed) file."""
+        self._file = f
+        self._decompressor = bz2.BZ2Decompressor() if compressed else None
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._chunk_size = chunk_size
+        self._buffer = u''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Read more data into the buffer, return False at end of file."""
+        if self._eof:
+            return False
+
+        raw = self._file.read(self._chunk_size)
+        if raw:
+            if self._decompressor is not None:
+                raw = self._decompressor.decompress(raw)
+            text = self._decoder.decode(raw)
+        else:
+            self._eof = True
+            text = self._decoder.decode(b'', True)
+
+        # Drop the consumed data so the buffer does not grow with the file
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non whitespace character or '' at end of file."""
+        while True:
+            self._pos = WHITESPACE_RE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            elif not self._fill():
+                return ''
+
+    def expect(self, chars):
+        """Consume and return the next character, which must be in `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expected one of {0!r}, found {1!r}'.format(
+                chars, char))
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                # Value not complete yet
+                if not self._fill():
+                    raise
+                continue
+
+            # A number at the end of the buffer might still be incomplete
+            if end < len(self._buffer) or not self._fill():
+                self._pos = end
+                return obj
+
+    def members(self):
+        """Iterate over the `(key, stream)` members of the next JSON object.
+
+        The value of each member must be consumed before the next iteration.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self
+            if self.expect(',}') == '}':
+                break
+
+
+def iter_repodata_packages(filepath, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over the `(canonical_name, data)` package records of a repodata.
+
+    The file is decompressed and parsed in chunks, so only one package record
+    is decoded in memory at a time.
+    """
+    compressed = filepath.endswith('.bz2')
+
+    with open(filepath, 'rb') as f:
+        stream = _JSONStream(f, compressed=compressed, chunk_size=chunk_size)
+        for key, value_stream in stream.members():
+            if key in ('packages', 'packages.conda') and \
+                    value_stream.peek() == '{':
+                # Only the `packages` records are used, the rest is skipped
+                # one record at a time
+                for canonical_name, record in value_stream.members():
+                    data = record.value()
+                    if key == 'packages':
+                        yield canonical_name, data
+            else:
+                value_stream.value()
+
+
+def fold_package_record(all_packages, canonical_name, data):
+    """Add a repodata package record to the `all_packages` aggregate."""
+    name, version, b = tuple(canonical_name.rsplit('-', 2))
+
+    if name not in all_packages:
+        all_packages[name] = {'versions': set(),
+                              'size': {},
+                              'type': {},
+                              'app_entry': {},
+                              'app_type': {},
+                              }
+
+    package = all_packages[name]
+    package['versions'].add(version)
+    package['size'][version] = data.get('size', '')
+
+    # Only the latest builds will have the correct metadata for apps, so only
+    # store apps that have the app metadata
+    if data.get('type'):
+        package['type'][version] = data.get('type')
+        package['app_entry'][version] = data.get('app_entry')
+        package['app_type'][version] = data.get('app_type')
+
+
+# --- Repodata reduction
+# -----------------------------------------------------------------------------
+def reduce_repodata_file(filepath):
+    """
+    Reduce a repodata file to a partial `{name: PackageRecord}` map.
+
+    This is a module level function so it can be run in a process pool.
+    """
+    partial = {}
+
+    if os.path.isfile(filepath):
+        try:
+            for canonical_name, data in iter_repodata_packages(filepath):
+                fold_package_record(partial, canonical_name, data)
+        except Exception as error:
+            logger.error(str((filepath, error)))
+
+    return dict((intern_string(name), PackageRecord.from_data(data))
+                for name, data in partial.items())
+
+
+def _get_pool(processes):
+    """
+    Return the shared process pool with `processes` workers, or None.
+
+    Workers are spawned, forking the multithreaded Qt process can deadlock
+    the children. The pool is kept for the next loads, so the workers only
+    start (and import this module) once.
+    """
+    global _POOL, _POOL_PROCESSES
+
+    # Python 2 can only fork
+    if not hasattr(multiprocessing, 'get_context'):
+        return None
+
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_PROCESSES != processes:
+            _POOL.terminate()
+            _POOL = None
+
+        if _POOL is None:
+            context = multiprocessing.get_context('spawn')
+            _POOL = context.Pool(processes)
+            _POOL_PROCESSES = processes
+
+        return _POOL
+
+
+def close_pool():
+    """Stop the workers of the shared process pool, if any."""
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.terminate()
+            _POOL = None
+
+
+atexit.register(close_pool)
+
+
+def _total_size(filepaths):
+    """Return the total size in bytes of the existing `filepaths`."""
+    size = 0
+    for path in filepaths:
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            pass
+    return size
+
+
+def reduce_repodata_files(filepaths, processes=None):
+    """
+    Reduce repodata files in a process pool, one task per file.
+
+    Return the list of partials in the same order as `filepaths`. If
+    `processes` is None the number of cpus is used. Files are reduced in the
+    current process if there is only one, or if they are smaller than
+    `PARALLEL_MIN_SIZE` in total.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if (processes > 1 and len(filepaths) > 1 and
+            _total_size(filepaths) >= PARALLEL_MIN_SIZE):
+        try:
+            pool = _get_pool(processes)
+            if pool is not None:
+                return pool.map(reduce_repodata_file, filepaths)
+        except Exception as error:
+            logger.error(str(error))
+
+    return [reduce_repodata_file(path) for path in filepaths]
+
+
+def finalize_package(name, parts, metadata):
+    """
+    Merge the partial records of package `name` and apply `metadata`.
+
+    Later parts take precedence for the data of a given version. Return the
+    `(record, app_record)` of the package, `app_record` is None if the
+    package is not an app.
+    """
+    sizes = {}
+    apps = {}
+    for part in parts:
+        sizes.update(zip(part.versions, part.sizes))
+        if part.apps:
+            apps.update(part.apps)
+
+    versions = sort_versions(list(sizes))
+    data = metadata.get(name)
+    if data is not None:
+        meta = {'home': data.get('home', ''),
+                'license': data.get('license', ''),
+                'summary': data.get('summary', ''),
+                'latest_version': data.get('version')}
+    else:
+        meta = {}
+
+    record = PackageRecord(versions=versions,
+                           sizes=[sizes[v] for v in versions],
+                           apps=apps,
+                           **meta)
+
+    # Has type in this case implies being an app
+    app = None
+    if apps:
+        # Remove all versions that are not apps!
+        app = record.copy(versions=[v for v in versions if v in apps])
+
+    return record, app
+
+
+def merge_partials(partials, metadata=None):
+    """
+    Merge partial `{name: PackageRecord}` maps into packages and apps.
+
+    Return the `(packages, apps)` dicts of the merged records.
+    """
+    metadata = metadata if metadata else {}
+    parts = {}
+    for partial in partials:
+        for name, record in partial.items():
+            parts.setdefault(name, []).append(record)
+
+    packages, apps = {}, {}
+    for name in parts:
+        record, app = finalize_package(name, parts[name], metadata)
+        packages[name] = record
+        if app is not None:
+            apps[name] = app
+
+    return packages, apps
+
+
+# --- Binary index cache
+# -----------------------------------------------------------------------------
+def _file_sha1(path, chunk_size=CHUNK_SIZE):
+    """Return the sha1 hex digest of the content of file `path`."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _read_index_header(f):
+    """Read the header of an open index file, return None if not valid."""
+    if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+        return None
+
+    header = pickle.load(f)
+    if header.get('version') != INDEX_VERSION:
+        return None
+
+    return header
+
+
+def load_index_header(index_path):
+    """Return the header of the index cache `index_path` or None."""
+    if not os.path.isfile(index_path):
+        return None
+
+    try:
+        with open(index_path, 'rb') as f:
+            return _read_index_header(f)
+    except Exception as error:
+        logger.error(str(error))
+        return None
+
+
+def index_key(filepaths, metadata=None, index_path=None):
+    """
+    Return the key identifying the reduced data of `filepaths`.
+
+    The key holds the size, mtime and sha1 of every file plus a digest of the
+    `metadata`. Files are only hashed if their size or mtime changed since
+    they were stored in the cache at `index_path`.
+    """
+    header = load_index_header(index_path) if index_path else None
+    known = {}
+    if header:
+        for path, size, mtime, sha1 in header['key']['files']:
+            known[path] = (size, mtime, sha1)
+
+    files = []
+    for path in filepaths:
+        if not os.path.isfile(path):
+            continue
+
+        stat = os.stat(path)
+        size, mtime = stat.st_size, stat.st_mtime
+        previous = known.get(path)
+        if previous and previous[:2] == (size, mtime):
+            sha1 = previous[2]
+        else:
+            sha1 = _file_sha1(path)
+        files.append((path, size, mtime, sha1))
+
+    metadata_json = json.dumps(metadata or {}, sort_keys=True)
+    metadata_digest = hashlib.sha1(metadata_json.encode('utf-8')).hexdigest()
+
+    return {'files': files, 'metadata': metadata_digest}
+
+
+def _same_key(key, other):
+    """Compare index keys by file content, ignoring mtimes."""
+    def content(k):
+        return ([(path, size, sha1) for path, size, mtime, sha1 in k['files']],
+                k['metadata'])
+
+    return content(key) == content(other)
+
+
+def load_index(index_path, key):
+    """
+    Return the data cached in `index_path` if it was stored for `key`.
+
+    Return None if there is no valid cache for `key`. The cached data is
+    only unpickled if the key matches.
+    """
+    if not os.path.isfile(index_path):
+        return None
+
+    try:
+        with open(index_path, 'rb') as f:
+            header = _read_index_header(f)
+            if header is None or not _same_key(header['key'], key):
+                return None
+            data = pickle.load(f)
+    except Exception as error:
+        logger.error(str(error))
+        return None
+
+    if header['key'] != key:
+        # Same content but touched files, store the new mtimes to avoid
+        # hashing them again
+        save_index(index_path, key, data)
+
+    return data
+
+
+def save_index(index_path, key, data):
+    """Store `data` for `key` in the index cache `index_path` atomically."""
+    folder = os.path.dirname(os.path.abspath(index_path))
+    header = {'version': INDEX_VERSION, 'key': key}
+    temp_path = None
+
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+        replace_file(temp_path, index_path)
+    except Exception as error:
+        logger.error(str(error))
+        if temp_path and os.path.isfile(temp_path):
+            os.remove(temp_path)
+
+
+def load_partials(index_path):
+    """Return the `{path: (sha1, partial)}` stored next to `index_path`."""
+    partials_path = index_path + PARTIALS_SUFFIX
+    if not os.path.isfile(partials_path):
+        return {}
+
+    try:
+        with open(partials_path, 'rb') as f:
+            if _read_index_header(f) is None:
+                return {}
+            return pickle.load(f)
+    except Exception as error:
+        logger.error(str(error))
+        return {}
+
+
+def save_partials(index_path, partials):
+    """Store the `{path: (sha1, partial)}` map next to `index_path`."""
+    save_index(index_path + PARTIALS_SUFFIX, None, partials)
+
+
+# --- Incremental repodata index
+# -----------------------------------------------------------------------------
+class RepodataIndex(object):
+    """
+    Combined packages and apps of a set of repodata files.
+
+    The partial contribution of every file is kept, so when some files change
+    only those are reduced again and only the packages they contain are
+    merged again.
+    """
+
+    def __init__(self):
+        """Combined packages and apps of a set of repodata files."""
+        self._lock = threading.Lock()
+        self._key = None
+        self._partials = {}
+        self._packages = {}
+        self._apps = {}
+        self._partials_loaded = False
+
+    def _result(self):
+        """Return shallow copies of the combined packages and apps."""
+        return (PackageStore(dict(self._packages)),
+                PackageStore(dict(self._apps)))
+
+    def _update_package(self, name, paths, metadata):
+        """Merge the data of package `name` from the partials of `paths`."""
+        parts = []
+        for path in paths:
+            partial = self._partials[path][1]
+            if name in partial:
+                parts.append(partial[name])
+
+        self._packages.pop(name, None)
+        self._apps.pop(name, None)
+
+        if parts:
+            record, app = finalize_package(name, parts, metadata)
+            self._packages[name] = record
+            if app is not None:
+                self._apps[name] = app
+
+    def load(self, filepaths, metadata=None, processes=None,
+             index_path=None):
+        """
+        Return the combined `(packages, apps)` of the repodata `filepaths`.
+
+        Files whose content did not change since the previous call are not
+        parsed again. If `index_path` is given, the result and the partials
+        are cached there for the next session.
+
+        The returned `PackageStore`s are copies, but the records they hold
+        are shared and must not be modified.
+        """
+        metadata = metadata if metadata else {}
+
+        with self._lock:
+            key = index_key(filepaths, metadata=metadata,
+                            index_path=index_path)
+
+            if self._key is not None and _same_key(self._key, key):
+                self._key = key
+                return self._result()
+
+            if index_path and self._key is None:
+                cached = load_index(index_path, key)
+                if cached is not None:
+                    # Partials are only read from disk once they are needed
+                    self._key = key
+                    self._packages, self._apps = cached
+                    return self._result()
+
+            self._update(key, metadata, processes, index_path)
+
+            if index_path:
+                save_index(index_path, key, (self._packages, self._apps))
+                save_partials(index_path, self._partials)
+
+            return self._result()
+
+    def _update(self, key, metadata, processes, index_path):
+        """Reduce the changed files and merge the affected packages."""
+        files = key['files']
+        paths = [path for path, size, mtime, sha1 in files]
+        sha1s = dict((path, sha1) for path, size, mtime, sha1 in files)
+
+        if index_path and not self._partials_loaded:
+            self._partials_loaded = True
+            for path, item in load_partials(index_path).items():
+                if path not in self._partials:
+                    self._partials[path] = item
+
+        old = self._key
+        old_paths = [f[0] for f in old['files']] if old else []
+        old_partials = dict(self._partials)
+
+        changed = [path for path in paths if
+                   self._partials.get(path, (None, None))[0] != sha1s[path]]
+        partials = reduce_repodata_files(changed, processes=processes)
+        for path, partial in zip(changed, partials):
+            self._partials[path] = (sha1s[path], partial)
+
+        for path in list(self._partials):
+            if path not in sha1s:
+                self._partials.pop(path)
+
+        # Everything is merged again if the order of the files (which sets
+        # the precedence) or the metadata changed, or if the previous content
+        # of a changed file is not known
+        full = (old is None or old_paths != paths or
+                old['metadata'] != key['metadata'] or
+                any(path not in old_partials for path in changed))
+
+        if full:
+            self._packages = {}
+            self._apps = {}
+            names = set()
+            for path in paths:
+                names.update(self._partials[path][1])
+        else:
+            names = set()
+            for path in changed:
+                names.update(old_partials[path][1])
+                names.update(self._partials[path][1])
+
+        for name in names:
+            self._update_package(name, paths, metadata)
+
+        self._key = key
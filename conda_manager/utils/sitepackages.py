@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Python distributions installed in the site-packages of conda environments.
+
+The `*.dist-info`, `*.egg-info` and `*.egg` metadata is read directly,
+without starting the Python of the environment. Development installs are
+found through their `*.egg-link` file. Only the `Name` and `Version` headers
+are parsed, and a site-packages folder is only scanned again when its
+modification time changes.
+"""
+
+# Standard library imports
+import glob
+import io
+import os
+import re
+import sys
+import threading
+import zipfile
+
+# Local imports
+from conda_manager.utils.misc import get_mtime
+
+# Metadata of wheels and of eggs / setuptools installs
+DIST_INFO = '.dist-info'
+EGG_INFO = '.egg-info'
+
+# Eggs installed by easy_install / setuptools, as a folder or a zip file
+EGG = '.egg'
+EGG_PKG_INFO = 'EGG-INFO/PKG-INFO'
+
+# Link to the project folder of a `pip install -e` / `setup.py develop`
+EGG_LINK = '.egg-link'
+
+# Distributions pip hides from its list of installed distributions
+SKIPPED_DISTRIBUTIONS = ('python', 'wsgiref', 'argparse')
+
+_UNSAFE_NAME_CHARS = re.compile(r'[^A-Za-z0-9.]+')
+
+
+def site_packages_dirs(prefix):
+    """Return the site-packages folders of the environment in `prefix`."""
+    if sys.platform == 'win32':
+        pattern = os.path.join(prefix, 'Lib', 'site-packages')
+    else:
+        pattern = os.path.join(prefix, 'lib', 'python*', 'site-packages')
+    return sorted(path for path in glob.glob(pattern) if os.path.isdir(path))
+
+
+def canonical_name(name, version):
+    """Return the `name-version-pip` canonical name of a distribution."""
+    name = _UNSAFE_NAME_CHARS.sub('-', name).lower()
+    return '{0}-{1}-pip'.format(name, version)
+
+
+def _metadata_path(path):
+    """Return the metadata file of the `path` metadata entry, or None."""
+    if path.endswith(DIST_INFO):
+        return os.path.join(path, 'METADATA')
+    elif path.endswith(EGG):
+        return os.path.join(path, *EGG_PKG_INFO.split('/'))
+    elif os.path.isdir(path):
+        return os.path.join(path, 'PKG-INFO')
+    else:
+        # Single file `*.egg-info` of distutils installs
+        return path
+
+
+def _read_headers(lines, headers):
+    """Read the `Name` and `Version` headers of metadata `lines`."""
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            break
+        key, sep, value = line.partition(':')
+        key = key.lower()
+        if sep and key in ('name', 'version'):
+            headers.setdefault(key, value.strip())
+            if len(headers) == 2:
+                break
+
+
+def read_metadata(path):
+    """
+    Return the `(name, version)` of the metadata entry `path`, or None.
+
+    Only the headers are read, the long description after them is skipped.
+    """
+    headers = {}
+    try:
+        if path.endswith(EGG) and os.path.isfile(path):
+            # Zipped egg
+            with zipfile.ZipFile(path) as egg:
+                text = egg.read(EGG_PKG_INFO).decode('utf-8', 'replace')
+            _read_headers(text.splitlines(), headers)
+        else:
+            with io.open(_metadata_path(path), encoding='utf-8',
+                         errors='replace') as f:
+                _read_headers(f, headers)
+    except (IOError, OSError, KeyError, zipfile.BadZipfile):
+        pass
+
+    if len(headers) != 2:
+        # Fall back to the `name-version.dist-info` entry name
+        entry = os.path.splitext(os.path.basename(path))[0]
+        parts = entry.split('-')
+        if len(parts) < 2:
+            return None
+        headers.setdefault('name', parts[0])
+        headers.setdefault('version', parts[1])
+
+    return headers['name'], headers['version']
+
+
+def read_egg_link(path):
+    """
+    Return the `(name, version)` of the development install `path`, or None.
+
+    The first line of an egg link is the project folder, which holds the
+    `*.egg-info` metadata of the project.
+    """
+    try:
+        with io.open(path, encoding='utf-8', errors='replace') as f:
+            project = f.readline().strip()
+    except (IOError, OSError):
+        return None
+
+    if not project:
+        return None
+
+    project = os.path.join(os.path.dirname(path), project)
+    for entry in sorted(glob.glob(os.path.join(project, '*' + EGG_INFO))):
+        metadata = read_metadata(entry)
+        if metadata is not None:
+            return metadata
+    return None
+
+
+def scan_site_packages(path):
+    """Return the canonical names of the distributions in folder `path`."""
+    try:
+        entries = os.listdir(path)
+    except OSError:
+        return frozenset()
+
+    names = set()
+    for entry in entries:
+        if entry.endswith((DIST_INFO, EGG_INFO, EGG)):
+            metadata = read_metadata(os.path.join(path, entry))
+        elif entry.endswith(EGG_LINK):
+            metadata = read_egg_link(os.path.join(path, entry))
+        else:
+            continue
+
+        if metadata is None:
+            continue
+
+        name, version = metadata
+        if name.lower() not in SKIPPED_DISTRIBUTIONS:
+            names.add(canonical_name(name, version))
+    return frozenset(names)
+
+
+class SitePackages(object):
+    """
+    Cache of the distributions installed in the site-packages folders.
+
+    Every folder is cached by its modification time, installing or removing
+    a distribution adds or removes a metadata entry and changes it. Version
+    changes of a development install made in its project folder are only
+    seen once the site-packages folder changes.
+    """
+
+    def __init__(self):
+        """Cache of the distributions installed in site-packages folders."""
+        self._scans = {}  # {path: (mtime, canonical names)}
+        self._lock = threading.Lock()
+
+    def _scan(self, path):
+        """Return the canonical names of folder `path`, scanning if needed."""
+        mtime = get_mtime(path)
+        with self._lock:
+            scan = self._scans.get(path)
+        if scan is not None and scan[0] == mtime:
+            return scan[1]
+
+        names = scan_site_packages(path)
+        with self._lock:
+            self._scans[path] = (mtime, names)
+        return names
+
+    def get(self, prefix):
+        """Return the canonical names installed in the `prefix` folders."""
+        names = set()
+        if prefix:
+            for path in site_packages_dirs(prefix):
+                names.update(self._scan(path))
+        return frozenset(names)
+
+    def invalidate(self, prefix=None):
+        """Drop the scans of `prefix`, or all of them if None."""
+        with self._lock:
+            if prefix is None:
+                self._scans.clear()
+            else:
+                for path in site_packages_dirs(prefix):
+                    self._scans.pop(path, None)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Compact in memory store of the available packages.
+
+Every package is a `PackageRecord` with `__slots__`, its versions are a
+tuple of interned strings and its sizes an array aligned with the versions.
+App information is only stored for the versions that are apps.
+"""
+
+# Standard library imports
+from array import array
+
+# Local imports
+from conda_manager.utils import constants as C
+from conda_manager.utils.py3compat import intern
+
+# Value of unknown package sizes in the sizes array
+UNKNOWN_SIZE = -1
+
+# Array typecode of the sizes, doubles hold exact integers up to 2**53
+SIZE_TYPECODE = 'd'
+
+
+def intern_string(text):
+    """
+    Return a shared instance of string `text`.
+
+    Interned strings are released once no package refers to them anymore.
+    """
+    try:
+        return intern(text)
+    except TypeError:
+        # Python 2 only interns byte strings
+        return text
+
+
+def _to_size(value):
+    """Convert a repodata size to a value of the sizes array."""
+    try:
+        return float(int(value))
+    except (TypeError, ValueError):
+        return UNKNOWN_SIZE
+
+
+def installed_status(version, versions):
+    """
+    Return the status of a conda package installed at `version`.
+
+    `versions` are the sorted available versions of the package, the status
+    tells if the installed version can be upgraded and/or downgraded.
+    """
+    status = C.INSTALLED
+    if version in versions and len(versions) != 1:
+        upgradable = version != versions[-1]
+        downgradable = version != versions[0]
+
+        if upgradable and downgradable:
+            status = C.MIXGRADABLE
+        elif upgradable:
+            status = C.UPGRADABLE
+        elif downgradable:
+            status = C.DOWNGRADABLE
+    return status
+
+
+class PackageRecord(object):
+    """Information of a single package name for all its versions."""
+
+    __slots__ = ('versions', 'sizes', 'apps', 'summary', 'home', 'license',
+                 'latest_version')
+
+    def __init__(self, versions=(), sizes=None, apps=None, summary=None,
+                 home=None, license=None, latest_version=None):
+        """Information of a single package name for all its versions."""
+        self.versions = tuple(intern_string(v) for v in versions)
+        if sizes is None:
+            sizes = [UNKNOWN_SIZE] * len(self.versions)
+        self.sizes = array(SIZE_TYPECODE, sizes)
+        # Sparse {version: (type, app_entry, app_type)} of app versions
+        self.apps = apps or None
+        self.summary = summary
+        self.home = home
+        self.license = license
+        self.latest_version = latest_version
+
+    def __getstate__(self):
+        """Return the state of the record for pickling."""
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        """Restore a pickled record, interning its versions."""
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+        self.versions = tuple(intern_string(v) for v in self.versions)
+
+    def __eq__(self, other):
+        """Compare records by value."""
+        return (isinstance(other, PackageRecord) and
+                self.__getstate__() == other.__getstate__())
+
+    def __ne__(self, other):
+        """Compare records by value."""
+        return not self == other
+
+    def __repr__(self):
+        """Return the representation of the record."""
+        return 'PackageRecord(versions={0!r})'.format(self.versions)
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Create a record from a package data dict.
+
+        The dict uses the `versions`, `size`, `type`, `app_entry` and
+        `app_type` keys of the repodata loader.
+        """
+        versions = list(data.get('versions', []))
+        size = data.get('size') or {}
+        types = data.get('type') or {}
+        app_entry = data.get('app_entry') or {}
+        app_type = data.get('app_type') or {}
+
+        apps = {}
+        for version in versions:
+            if types.get(version):
+                apps[intern_string(version)] = (types.get(version),
+                                                app_entry.get(version),
+                                                app_type.get(version))
+
+        return cls(versions=versions,
+                   sizes=[_to_size(size.get(v)) for v in versions],
+                   apps=apps,
+                   summary=data.get('summary'),
+                   home=data.get('home'),
+                   license=data.get('license'),
+                   latest_version=data.get('latest_version'))
+
+    def copy(self, versions=None):
+        """
+        Return a copy of the record, optionally with another `versions`.
+
+        Sizes and app information are kept for the versions still present.
+        """
+        if versions is None:
+            versions = self.versions
+
+        sizes = dict(zip(self.versions, self.sizes))
+        apps = None
+        if self.apps:
+            apps = dict((v, self.apps[v]) for v in versions if v in self.apps)
+
+        return PackageRecord(versions=versions,
+                             sizes=[sizes.get(v, UNKNOWN_SIZE)
+                                    for v in versions],
+                             apps=apps,
+                             summary=self.summary,
+                             home=self.home,
+                             license=self.license,
+                             latest_version=self.latest_version)
+
+    def size(self, version, default=None):
+        """Return the size of `version` or `default` if not known."""
+        try:
+            size = self.sizes[self.versions.index(version)]
+        except ValueError:
+            return default
+        return default if size == UNKNOWN_SIZE else int(size)
+
+    def is_app(self):
+        """Return True if any version of the package is an app."""
+        return bool(self.apps)
+
+    def get(self, key, default=None):
+        """
+        Return the value of `key` like the package data dicts did.
+
+        This is kept for compatibility, it builds the per version dicts
+        for the `size`, `type`, `app_entry` and `app_type` keys.
+        """
+        if key == 'versions':
+            return list(self.versions)
+        elif key == 'size':
+            return dict((v, int(s)) for v, s in zip(self.versions, self.sizes)
+                        if s != UNKNOWN_SIZE)
+        elif key in ('type', 'app_entry', 'app_type'):
+            index = ('type', 'app_entry', 'app_type').index(key)
+            apps = self.apps or {}
+            return dict((v, apps[v][index]) for v in apps)
+        elif key in ('summary', 'home', 'license', 'latest_version'):
+            value = getattr(self, key)
+            return default if value is None else value
+        else:
+            return default
+
+
+class PackageStore(object):
+    """Mapping of package names to `PackageRecord`."""
+
+    __slots__ = ('_records', )
+
+    def __init__(self, records=None):
+        """Mapping of package names to `PackageRecord`."""
+        self._records = records if records is not None else {}
+
+    @classmethod
+    def from_dicts(cls, packages):
+        """Create a store from a `{name: package data dict}` mapping."""
+        if isinstance(packages, PackageStore):
+            return packages
+
+        records = {}
+        for name, data in packages.items():
+            if not isinstance(data, PackageRecord):
+                data = PackageRecord.from_data(data)
+            records[intern_string(name)] = data
+        return cls(records)
+
+    def __contains__(self, name):
+        """Return True if package `name` is in the store."""
+        return name in self._records
+
+    def __getitem__(self, name):
+        """Return the record of package `name`."""
+        return self._records[name]
+
+    def __setitem__(self, name, record):
+        """Set the record of package `name`."""
+        self._records[intern_string(name)] = record
+
+    def __iter__(self):
+        """Iterate over the package names."""
+        return iter(self._records)
+
+    def __len__(self):
+        """Return the number of packages."""
+        return len(self._records)
+
+    def get(self, name, default=None):
+        """Return the record of package `name` or `default`."""
+        return self._records.get(name, default)
+
+    def pop(self, name, *args):
+        """Remove and return the record of package `name`."""
+        return self._records.pop(name, *args)
+
+    def keys(self):
+        """Return the package names."""
+        return self._records.keys()
+
+    def items(self):
+        """Return the `(name, record)` pairs."""
+        return self._records.items()
+
+    def copy(self):
+        """Return a shallow copy of the store, records are shared."""
+        return PackageStore(dict(self._records))
+
+    def versions(self, name):
+        """Return the sorted versions of package `name`."""
+        record = self._records.get(name)
+        return list(record.versions) if record is not None else []
+
+    def size(self, name, version, default=None):
+        """Return the size of `version` of package `name` or `default`."""
+        record = self._records.get(name)
+        if record is None:
+            return default
+        return record.size(version, default=default)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""Bookkeeping of the workers that run in their own QThread."""
+
+# Third party imports
+from qtpy.QtCore import QObject
+
+
+class WorkerThreads(QObject):
+    """
+    References of the workers running in their own `QThread`.
+
+    Threads and workers are kept alive until the thread finishes, then they
+    are released and deleted. The `finished` signal is connected to a bound
+    method, a closure would keep both objects alive for good.
+    """
+
+    def __init__(self, parent=None):
+        """References of the workers running in their own `QThread`."""
+        super(WorkerThreads, self).__init__(parent)
+        self._workers = {}  # {thread: worker}
+
+    def add(self, thread, worker):
+        """Keep `thread` and `worker` until the thread finishes."""
+        self._workers[thread] = worker
+        # The worker lives in `thread`, so this is run before it ends
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(self._thread_finished)
+
+    def discard(self, thread):
+        """
+        Release a `thread` that was never started and its worker.
+
+        No event loop will ever run for them, so they are deleted when
+        their last Python reference goes away.
+        """
+        worker = self._workers.pop(thread, None)
+        if worker is not None:
+            thread.finished.disconnect(worker.deleteLater)
+            thread.finished.disconnect(self._thread_finished)
+
+    def threads(self):
+        """Return the threads not finished yet."""
+        return list(self._workers)
+
+    def workers(self):
+        """Return the workers whose thread has not finished yet."""
+        return list(self._workers.values())
+
+    def _thread_finished(self):
+        """Release the finished thread that sent the signal."""
+        thread = self.sender()
+        # `finished` is emitted right before the thread ends
+        thread.wait()
+        self._workers.pop(thread, None)
+        thread.deleteLater()
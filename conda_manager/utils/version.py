@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Version ordering following the conda rules.
+
+Versions are parsed once into flat tuples that compare with the builtin
+tuple comparison, so sorting is a single pass with a precomputed key.
+
+Conda compares versions component by component (components are separated
+by `.`, `_` or `-`) and each component is split into integer and string
+atoms. Shorter versions and components are padded with zeros and strings
+sort before integers, so `1.1a1 < 1.1 == 1.1.0 < 1.1.1`. `dev` sorts before
+any other string and `post` after any number.
+
+The padding is encoded in the key: trailing zeros are dropped and every
+zero atom, component separator and the end of the version is tagged with
+how the rest of the version compares to zeros.
+"""
+
+# Standard library imports
+import re
+
+# Maximum number of version keys kept in memory
+KEY_CACHE_SIZE = 100000
+
+SEPARATORS_RE = re.compile(r'[._\-]')
+ATOMS_RE = re.compile(r'\d+|[^\d]+')
+
+# Atom encodings
+_ZERO_BELOW = (1, 0, -1)   # Zero atom followed by a smaller component rest
+_ZERO_ABOVE = (1, 0, 1)    # Zero atom followed by a larger component rest
+_POST = (2, )
+_SEP_BELOW = (1, 0, 0, -1)  # Component separator, the rest is smaller
+_SEP_ABOVE = (1, 0, 0, 1)   # Component separator, the rest is larger
+_END = (1, 0, 0, 0)
+
+_KEY_CACHE = {}
+
+
+def _parse_component(component):
+    """Split a version component into integer and string atoms."""
+    atoms = []
+    for atom in ATOMS_RE.findall(component):
+        if atom.isdigit():
+            atoms.append(int(atom))
+        elif atom == 'post':
+            atoms.append(float('inf'))
+        elif atom == 'dev':
+            atoms.append('DEV')
+        else:
+            atoms.append(atom)
+
+        # The first atom of a component is always a number
+        if len(atoms) == 1 and not atom.isdigit():
+            atoms.insert(0, 0)
+
+    # Trailing zeros are equal to the padding
+    while atoms and atoms[-1] == 0:
+        atoms.pop()
+
+    return atoms
+
+
+def _sign(atom):
+    """Return how a non zero atom compares to zero."""
+    return -1 if isinstance(atom, str) else 1
+
+
+def _flatten(part):
+    """Return the flat key of the version (or local version) `part`."""
+    if not part:
+        return (_END, )
+
+    # A trailing underscore stays in the last component, like in conda it
+    # marks openssl like post releases: `1.1dev1 < 1.1_ < 1.1a1 < 1.1`
+    trailing = part.endswith('_')
+    texts = SEPARATORS_RE.split(part[:-1] if trailing else part)
+    if trailing:
+        texts[-1] += '_'
+
+    components = [_parse_component(c) for c in texts]
+    while components and not components[-1]:
+        components.pop()
+
+    key = []
+    # Walk backwards, so the sign of the rest is known for every position
+    rest = 0
+    for index in range(len(components) - 1, -1, -1):
+        atoms = components[index]
+        encoded = []
+        comp_rest = 0
+        for atom in reversed(atoms):
+            if atom == 0:
+                encoded.append(_ZERO_BELOW if comp_rest < 0 else _ZERO_ABOVE)
+            else:
+                comp_rest = _sign(atom)
+                if isinstance(atom, str):
+                    encoded.append((0, atom))
+                elif atom == float('inf'):
+                    encoded.append(_POST)
+                else:
+                    encoded.append((1, atom))
+
+        if index < len(components) - 1:
+            key.append(_SEP_BELOW if rest < 0 else _SEP_ABOVE)
+        else:
+            key.append(_END)
+
+        key.extend(encoded)
+        if atoms:
+            rest = comp_rest
+
+    if not components:
+        key.append(_END)
+
+    key.reverse()
+    return tuple(key)
+
+
+def _str(version):
+    """Return `version` as a native string."""
+    if not isinstance(version, str):
+        try:
+            version = str(version)
+        except Exception:
+            version = version.encode('utf-8')
+    return version
+
+
+def version_key(version):
+    """
+    Return the sort key of `version` following the conda version ordering.
+
+    Keys are cached, so every distinct version string is only parsed once.
+    """
+    try:
+        return _KEY_CACHE[version]
+    except KeyError:
+        pass
+
+    text = _str(version).strip().lower()
+
+    epoch = 0
+    if '!' in text:
+        epoch, text = text.split('!', 1)
+        try:
+            epoch = int(epoch)
+        except ValueError:
+            epoch = 0
+
+    local = ''
+    if '+' in text:
+        text, local = text.split('+', 1)
+
+    key = (epoch, _flatten(text), _flatten(local))
+
+    if len(_KEY_CACHE) >= KEY_CACHE_SIZE:
+        _KEY_CACHE.clear()
+    _KEY_CACHE[version] = key
+
+    return key
+
+
+def sort_versions(versions=(), reverse=False):
+    """Sort a list of version strings following the conda version ordering."""
+    return sorted(versions, key=version_key, reverse=reverse)
+
+
+def max_version(versions, default=None):
+    """Return the highest version of `versions` or `default` if empty."""
+    versions = list(versions)
+    return max(versions, key=version_key) if versions else default
+
+
+def min_version(versions, default=None):
+    """Return the lowest version of `versions` or `default` if empty."""
+    versions = list(versions)
+    return min(versions, key=version_key) if versions else default
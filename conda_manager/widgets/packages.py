@@ -26,10 +26,14 @@ from qtpy.QtWidgets import (QDialog, QDialogButtonBox, QHBoxLayout,
 
 # Local imports
 from conda_manager.api import ManagerAPI
+from conda_manager.models.packages import PackagesModelData
 from conda_manager.utils import get_conf_path, get_module_data_path
 from conda_manager.utils import constants as C
+from conda_manager.utils.blacklist import PackageBlacklist
 from conda_manager.utils.logs import logger
 from conda_manager.utils.py3compat import configparser as cp
+from conda_manager.utils.repodata import INDEX_FILENAME
+from conda_manager.utils.store import PackageStore
 from conda_manager.widgets import (DropdownPackageFilter, FramePackageTop,
                                    LabelPackageStatus, ProgressBarPackage)
 
@@ -165,13 +169,14 @@ class CondaPackagesWidget(QWidget):
         self._hide_widgets = False
         self._metadata = extra_metadata  # From repo.continuum
         self._metadata_links = {}        # Bundled metadata
+        self._model_worker = None        # Worker preparing the model data
         self.api = ManagerAPI()
         self.busy = False
         self.data_directory = data_directory
         self.conda_url = conda_url
         self.conda_api_url = conda_api_url
         self.name = name
-        self.package_blacklist = []
+        self.package_blacklist = PackageBlacklist()
         self.prefix = prefix
         self.root_prefix = self.api.ROOT_PREFIX
         self.style_sheet = None
@@ -290,6 +295,7 @@ class CondaPackagesWidget(QWidget):
 
         # Signals and slots
         self.api.sig_repodata_updated.connect(self._repodata_updated)
+        self.api.sig_environment_changed.connect(self._environment_changed)
         self.combobox_filter.currentIndexChanged.connect(self.filter_package)
         self.button_apply.clicked.connect(self.apply_multiple_actions)
         self.button_clear.clicked.connect(self.clear_actions)
@@ -364,14 +370,15 @@ class CondaPackagesWidget(QWidget):
         packages = worker.packages
 
         # Remove blacklisted packages
-        for package in self.package_blacklist:
-            if package in packages:
-                packages.pop(package)
-            for i, row in enumerate(data):
-                if package == data[i][C.COL_NAME]:
-                    data.pop(i)
-
-        self.table.setup_model(packages, data, self._metadata_links)
+        blacklisted = self.package_blacklist.filter_names(packages)
+        for package in blacklisted:
+            packages.pop(package)
+        data = [row for row in data
+                if row[C.COL_NAME] not in self.package_blacklist]
+
+        self.table.setup_model(PackagesModelData(packages, data),
+                               self._metadata_links)
+        self.api.watcher_set_prefixes([self.prefix])
         self.combobox_filter.setCurrentIndex(combobox_index)
         self.filter_package(status)
 
@@ -451,24 +458,38 @@ class CondaPackagesWidget(QWidget):
         packages = worker.packages
         private_packages = worker.private_packages
         linked_packages = self.api.conda_linked(prefix=self.prefix)
-        data = self.api.client_prepare_packages_data(packages,
-                                                     linked_packages,
-                                                     pip_packages,
-                                                     private_packages)
 
-        combobox_index = self.combobox_filter.currentIndex()
-        status = C.PACKAGE_STATUS[combobox_index]
+        # The rows are built, filtered and sorted in a worker thread
+        worker = self.api.client_prepare_packages_data(
+            packages, linked_packages, pip_packages, private_packages,
+            blacklist=self.package_blacklist)
+        worker.pip_error = error
+        worker.sig_finished.connect(self._model_data_ready)
+        self._model_worker = worker
 
-        # Remove blacklisted packages
-        for package in self.package_blacklist:
-            if package in packages:
-                packages.pop(package)
+    def _model_data_ready(self, worker, output, error):
+        """
+        Swap in the packages model prepared by `worker`.
+
+        Results of a worker superseded by a later environment load are
+        discarded.
+        """
+        if worker is not self._model_worker:
+            return
+        self._model_worker = None
+
+        if output is None:
+            logger.error(error)
+            self.update_status(str(error), False)
+            self.sig_packages_ready.emit()
+            return
 
-            for i, row in enumerate(data):
-                if package == data[i][C.COL_NAME]:
-                    data.pop(i)
+        error = worker.pip_error
+        combobox_index = self.combobox_filter.currentIndex()
+        status = C.PACKAGE_STATUS[combobox_index]
 
-        self.table.setup_model(packages, data, self._metadata_links)
+        self.table.setup_model(output, self._metadata_links)
+        self.api.watcher_set_prefixes([self.prefix])
         self.combobox_filter.setCurrentIndex(combobox_index)
         self.filter_package(status)
 
@@ -481,11 +502,91 @@ class CondaPackagesWidget(QWidget):
         self.sig_packages_ready.emit()
         self.table.setFocus()
 
+    def _environment_changed(self, prefix, kinds):
+        """
+        Update the rows of the packages changed by another process.
+
+        Only the status and version of the changed rows are updated, no
+        repodata is loaded and no process is started. Changes made while
+        busy are skipped, the model is built again once actions finish.
+        """
+        if prefix != self.prefix or self.busy:
+            return
+
+        logger.debug(str((prefix, kinds)))
+        if 'pip' in kinds:
+            # Site-packages is read in a worker thread
+            worker = self.api.pip_list(prefix=prefix)
+            worker.prefix = prefix
+            worker.sig_finished.connect(self._environment_pip_ready)
+        else:
+            self._update_environment_rows(prefix)
+
+    def _environment_pip_ready(self, worker, pip_packages, error):
+        """Callback for the pip list of an environment changed on disk."""
+        if error:
+            logger.error(error)
+        else:
+            self._update_environment_rows(worker.prefix, pip=pip_packages)
+
+    def _update_environment_rows(self, prefix, pip=None):
+        """Update the rows that differ from the packages in `prefix`."""
+        model = self.table.source_model
+        if prefix != self.prefix or self.busy or model is None:
+            return
+
+        if pip is not None:
+            # Blacklisted packages have no rows
+            names = dict((cname.rsplit('-', 2)[0], cname) for cname in pip)
+            blacklisted = self.package_blacklist.filter_names(names)
+            pip = [cname for name, cname in names.items()
+                   if name not in blacklisted]
+
+        snapshot = self.api.conda_environment_snapshot(prefix)
+        changes = model.linked_changes(snapshot, pip=pip)
+        if changes is None:
+            self._rebuild_environment_rows(pip)
+            return
+
+        statuses, versions = changes
+        if not statuses:
+            return
+
+        # Actions on the changed packages may no longer apply
+        actions = model.column(C.COL_ACTION)
+        cleared = dict((row, (C.ACTION_NONE, None)) for row in statuses
+                       if actions[row] != C.ACTION_NONE)
+        if cleared:
+            model.set_actions(cleared)
+            self.table.refresh_actions()
+        self.table.update_statuses(statuses, versions)
+
+    def _rebuild_environment_rows(self, pip):
+        """
+        Build the rows again for pip packages installed or removed.
+
+        The package store of the current model is reused, no repodata is
+        loaded and no process is started.
+        """
+        self._current_model_index = self.table.currentIndex()
+        self._current_table_scroll = self.table.verticalScrollBar().value()
+
+        model = self.table.source_model
+        linked_packages = self.api.conda_linked(prefix=self.prefix)
+        worker = self.api.client_prepare_packages_data(
+            model.package_store(), linked_packages, pip,
+            blacklist=self.package_blacklist)
+        worker.pip_error = None
+        worker.sig_finished.connect(self._model_data_ready)
+        self._model_worker = worker
+
     def _repodata_updated(self, paths):
         """
         """
+        index_path = osp.join(self.data_directory, INDEX_FILENAME)
         worker = self.api.client_load_repodata(paths, extra_data={},
-                                               metadata=self._metadata)
+                                               metadata=self._metadata,
+                                               index_path=index_path)
         worker.paths = paths
         worker.sig_finished.connect(self._prepare_model_data)
 
@@ -722,6 +823,8 @@ class CondaPackagesWidget(QWidget):
         """
         """
         logger.debug('')
+        packages = PackageStore.from_dicts(packages)
+        apps = PackageStore.from_dicts(apps)
         self._prepare_model_data(output=(packages, apps))
 
     # These should be private methods....
@@ -760,7 +863,8 @@ class CondaPackagesWidget(QWidget):
             downloaded files without checking for newer versions.
         blacklist: list of str
             List of conda package names to be excluded from the actual package
-            manager view.
+            manager view. Glob patterns (`qt*`) and regular expressions
+            prefixed by `re:` are also accepted.
         """
         self.sig_packages_busy.emit()
 
@@ -771,7 +875,7 @@ class CondaPackagesWidget(QWidget):
             logger.debug('')
 
         if blacklist:
-            self.package_blacklist = [p.lower() for p in blacklist]
+            self.package_blacklist = PackageBlacklist(blacklist)
 
         if metadata:
             self._metadata = metadata
@@ -16,7 +16,8 @@ import gettext
 
 # Third party imports
 from qtpy import PYQT5
-from qtpy.QtCore import Qt, QPoint, QSize, QUrl, Signal, QEvent
+from qtpy.QtCore import (Qt, QModelIndex, QPoint, QSize, QTimer, QUrl,
+                          Signal, QEvent)
 from qtpy.QtGui import QColor, QDesktopServices, QIcon, QPen, QBrush
 from qtpy.QtWidgets import (QAbstractItemView, QItemDelegate, QMenu,
                             QTableView)
@@ -80,6 +81,8 @@ class TableCondaPackages(QTableView):
     WIDTH_NAME = 120
     WIDTH_ACTIONS = 24
     WIDTH_VERSION = 90
+    HEIGHT_ICON = 24
+    ROW_PADDING = 10
 
     sig_status_updated = Signal(str, bool, list, bool)
     sig_conda_action_requested = Signal(str, int, str, object, object)
@@ -111,8 +114,14 @@ class TableCondaPackages(QTableView):
         self.pressed_here = False
 
         self.source_model = None
+        self.search_index = None
         self.proxy_model = None
 
+        # Rows not shown on the first screen are fetched when idle
+        self._timer_fetch = QTimer()
+        self._timer_fetch.setInterval(0)
+        self._timer_fetch.timeout.connect(self._fetch_more)
+
         self.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.setSelectionMode(QAbstractItemView.SingleSelection)
         self.verticalHeader().hide()
@@ -126,7 +135,8 @@ class TableCondaPackages(QTableView):
         self._delegate.has_focus_or_context = self.has_focus_or_context
         self.setItemDelegate(self._delegate)
         self.setShowGrid(False)
-        self.setWordWrap(True)
+        # Rows have a uniform height, long descriptions are elided
+        self.setWordWrap(False)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.horizontalHeader().setStretchLastSection(True)
 
@@ -136,6 +146,13 @@ class TableCondaPackages(QTableView):
             self._hheader.setSectionResizeMode(self._hheader.Fixed)
         else:
             self._hheader.setResizeMode(self._hheader.Fixed)
+
+        self._vheader = self.verticalHeader()
+        if PYQT5:
+            self._vheader.setSectionResizeMode(self._vheader.Fixed)
+        else:
+            self._vheader.setResizeMode(self._vheader.Fixed)
+        self.update_row_height()
 #        self._hheader.setStyleSheet("""QHeaderView {border: 0px;
 #                                                    border-radius: 0px;};
 #                                                    """)
@@ -143,58 +160,58 @@ class TableCondaPackages(QTableView):
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.hide_columns()
 
-    def setup_model(self, packages, data, metadata_links={}):
-        """ """
+    def setup_model(self, model_data, metadata_links={}):
+        """
+        Set up the model with a `PackagesModelData`.
+
+        The columns and the search index are built beforehand, usually in a
+        worker thread, so only the Qt objects are created here.
+        """
+        packages = model_data.packages
         self.proxy_model = MultiColumnSortFilterProxy(self)
-        self.source_model = CondaPackagesModel(self, packages, data)
+        self.source_model = CondaPackagesModel(self, model_data)
         self.proxy_model.setSourceModel(self.source_model)
         self.setModel(self.proxy_model)
         self.metadata_links = metadata_links
 
-        # FIXME: packages sizes... move to a better place?
-        packages_sizes = {}
-        for name in packages:
-            packages_sizes[name] = packages[name].get('size')
-        self._packages_sizes = packages_sizes
+        # The package store answers the size lookups of the dependencies
+        self._packages_sizes = packages
 
         # Custom Proxy Model setup
         self.proxy_model.setDynamicSortFilter(True)
 
-        filter_text = \
-            (lambda row, text, status: (
-             all([t in row[const.COL_NAME].lower() for t in
-                 to_text_string(text).lower().split()]) or
-             all([t in row[const.COL_DESCRIPTION].lower() for t in
-                 to_text_string(text).split()])))
-
-        filter_status = (lambda row, text, status:
-                         to_text_string(row[const.COL_STATUS]) in
-                         to_text_string(status))
-        self.model().add_filter_function('status-search', filter_status)
-        self.model().add_filter_function('text-search', filter_text)
-
-        # Signals and slots
-        self.verticalScrollBar().valueChanged.connect(self.resize_rows)
+        # Text and status filters are answered by the search index
+        self.search_index = model_data.search_index
+        self.proxy_model.sig_filter_finished.connect(self.filter_finished)
+        self.proxy_model.set_search_index(self.search_index)
 
         self.hide_columns()
-        self.resize_rows()
         self.refresh_actions()
         self.source_model.update_style_palette(self._palette)
+        self._timer_fetch.start()
+
+    def _fetch_more(self):
+        """Fetch the next rows of the source model while the GUI is idle."""
+        model = self.source_model
+        if model is not None and model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+        else:
+            self._timer_fetch.stop()
+            # The count label only counted the rows fetched at the time
+            self.filter_finished()
 
     def update_style_palette(self, palette={}):
         self._palette = palette
 
-    def resize_rows(self):
-        """ """
-        delta_y = 10
-        height = self.height()
-        y = 0
-        while y < height:
-            row = self.rowAt(y)
-            self.resizeRowToContents(row)
-            row_height = self.rowHeight(row)
-            self.setRowHeight(row, row_height + delta_y)
-            y += self.rowHeight(row) + delta_y
+    def update_row_height(self):
+        """
+        Set the height of all the rows from the font metrics.
+
+        All rows share the default section size of the vertical header, so
+        scrolling and filtering do no per row layout work.
+        """
+        height = max(self.fontMetrics().height(), self.HEIGHT_ICON)
+        self._vheader.setDefaultSectionSize(height + self.ROW_PADDING)
 
     def hide_columns(self):
         """ """
@@ -212,34 +229,36 @@ class TableCondaPackages(QTableView):
         for col in hide:
             self.hideColumn(col)
 
-    def filter_changed(self):
-        """Trigger the filter"""
+    def filter_changed(self, delayed=False):
+        """
+        Trigger the filter.
+
+        If `delayed` is True the filter waits for the user to stop typing.
+        """
         group = self._filterbox
         text = self._searchbox
 
         if group in [const.ALL]:
-            group = ''.join([to_text_string(const.INSTALLED),
-                             to_text_string(const.UPGRADABLE),
-                             to_text_string(const.NOT_INSTALLED),
-                             to_text_string(const.DOWNGRADABLE),
-                             to_text_string(const.MIXGRADABLE)])
+            group = (const.INSTALLED, const.UPGRADABLE, const.NOT_INSTALLED,
+                     const.DOWNGRADABLE, const.MIXGRADABLE)
         elif group in [const.INSTALLED]:
-            group = ''.join([to_text_string(const.INSTALLED),
-                             to_text_string(const.UPGRADABLE),
-                             to_text_string(const.DOWNGRADABLE),
-                             to_text_string(const.MIXGRADABLE)])
+            group = (const.INSTALLED, const.UPGRADABLE, const.DOWNGRADABLE,
+                     const.MIXGRADABLE)
         elif group in [const.UPGRADABLE]:
-            group = ''.join([to_text_string(const.UPGRADABLE),
-                             to_text_string(const.MIXGRADABLE)])
+            group = (const.UPGRADABLE, const.MIXGRADABLE)
         elif group in [const.DOWNGRADABLE]:
-            group = ''.join([to_text_string(const.DOWNGRADABLE),
-                             to_text_string(const.MIXGRADABLE)])
+            group = (const.DOWNGRADABLE, const.MIXGRADABLE)
         else:
-            group = to_text_string(group)
+            group = (group, )
 
         if self.proxy_model is not None:
-            self.proxy_model.set_filter(text, group)
-            self.resize_rows()
+            self.proxy_model.set_filter(text, group, delayed=delayed)
+        else:
+            self.filter_finished()
+
+    def filter_finished(self):
+        """Update the rows and the count label once the rows are filtered."""
+        text = self._searchbox
 
         # Update label count
         count = self.verticalHeader().count()
@@ -259,7 +278,7 @@ class TableCondaPackages(QTableView):
         """ """
         text = to_text_string(text)
         self._searchbox = text
-        self.filter_changed()
+        self.filter_changed(delayed=True)
 
     def filter_status_changed(self, text):
         """ """
@@ -299,18 +318,17 @@ class TableCondaPackages(QTableView):
         for col in action_cols:
             self.setColumnWidth(col, self.WIDTH_ACTIONS)
         QTableView.resizeEvent(self, event)
-        self.resize_rows()
 
-    def update_visible_rows(self):
-        current_index = self.currentIndex()
-        row = current_index.row()
+    def changeEvent(self, event):
+        """Override Qt method"""
+        QTableView.changeEvent(self, event)
+        if event.type() == QEvent.FontChange:
+            self.update_row_height()
 
+    def update_visible_rows(self):
+        """Repaint the visible rows with a single viewport update."""
         if self.proxy_model:
-            for r in range(row - 50,  row + 50):
-                for co in const.COLUMNS:
-                    index = self.proxy_model.index(r, co)
-                    self.update(index)
-            self.resize_rows()
+            self.viewport().update()
 
     def current_row(self):
 
@@ -663,6 +681,24 @@ class TableCondaPackages(QTableView):
         if self.source_model:
             return self.source_model.get_actions()
 
+    def update_statuses(self, statuses, versions=None):
+        """
+        Update the status (and version) of several rows at once.
+
+        statuses : dict
+            Maps source model rows to `const.PACKAGE_STATUS` values.
+        versions : dict
+            Maps source model rows to the version displayed.
+        """
+        if self.source_model is None:
+            return
+
+        changed = self.source_model.update_statuses(statuses, versions)
+        if changed:
+            for row in changed:
+                self.search_index.set_status(row, statuses[row])
+            self.proxy_model.refresh_filter()
+
     def clear_actions(self):
         index = self.currentIndex()
         if self.source_model:
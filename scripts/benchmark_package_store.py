@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""
+Compare the memory footprint of the package store and the nested dicts.
+
+Usage:
+    python scripts/benchmark_package_store.py [repodata.json.bz2 ...]
+
+If no repodata files are given, a synthetic channel is generated.
+"""
+
+# Standard library imports
+import sys
+import tracemalloc
+
+# Local imports
+from conda_manager.utils.repodata import (fold_package_record,
+                                          iter_repodata_packages,
+                                          merge_partials)
+from conda_manager.utils.store import PackageRecord
+
+
+def synthetic_records(packages=20000, versions=15):
+    """Generate repodata records of a channel of conda-forge size."""
+    for i in range(packages):
+        name = 'package-name-{0}'.format(i)
+        for j in range(versions):
+            version = '{0}.{1}.{2}'.format(j // 10, j % 10, i % 7)
+            canonical_name = '{0}-{1}-py35_{2}'.format(name, version, j)
+            data = {'size': 1000 * i + j}
+            if i % 50 == 0:
+                data.update({'type': 'app', 'app_entry': 'run',
+                             'app_type': 'desk'})
+            yield canonical_name, data
+
+
+def load_records(filepaths):
+    """Return the repodata records of `filepaths` or synthetic ones."""
+    if not filepaths:
+        return list(synthetic_records())
+
+    records = []
+    for path in filepaths:
+        records.extend(iter_repodata_packages(path))
+    return records
+
+
+def measure(func, *args):
+    """Return the result of `func` and the memory it allocated."""
+    tracemalloc.start()
+    result = func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def build_dicts(records):
+    """Build the nested dicts used before the package store."""
+    all_packages = {}
+    for canonical_name, data in records:
+        fold_package_record(all_packages, canonical_name, data)
+    for name in all_packages:
+        all_packages[name]['versions'] = sorted(all_packages[name]['versions'])
+    return all_packages
+
+
+def build_store(records):
+    """Build the package store."""
+    partial = {}
+    for canonical_name, data in records:
+        fold_package_record(partial, canonical_name, data)
+    partial = dict((name, PackageRecord.from_data(data))
+                   for name, data in partial.items())
+    return merge_partials([partial])
+
+
+def main():
+    """Print the memory used by both representations."""
+    records = load_records(sys.argv[1:])
+    print('Records: {0}'.format(len(records)))
+
+    dicts, dicts_size = measure(build_dicts, records)
+    print('Nested dicts:  {0:8.1f} MB for {1} packages'.format(
+        dicts_size / 1024.0 ** 2, len(dicts)))
+    del dicts
+
+    (store, apps), store_size = measure(build_store, records)
+    print('Package store: {0:8.1f} MB for {1} packages'.format(
+        store_size / 1024.0 ** 2, len(store)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright © 2015- The Spyder Development Team
+# Copyright © 2014-2015 Gonzalo Peña-Castellanos (@goanpeca)
+#
+# Licensed under the terms of the MIT License
+# -----------------------------------------------------------------------------
+"""Tests for the conda version ordering."""
+
+# Local imports
+from conda_manager.utils.version import sort_versions, version_key
+
+
+def test_padding():
+    assert version_key('1.1') == version_key('1.1.0')
+    assert version_key('1.1') < version_key('1.1.1')
+
+
+def test_trailing_underscore():
+    versions = ['1.1', '1.1a1', '1.1_', '1.1dev1']
+    assert sort_versions(versions) == ['1.1dev1', '1.1_', '1.1a1', '1.1']
+    assert version_key('1.1_') != version_key('1.1')